@@ -1,120 +1,217 @@
 import time
-import pandas as pd
-from tqdm import tqdm
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, Comment, NavigableString
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from datetime import date
 
-# URL of the CME Provider Directory
-url = "https://accme.org/cme-provider-directory/"
+from browser_pool import launch_browser, quit_browser
+from html_archive import archive_page
+from instrumentation import add_time, print_summary, timed, trace_page
+from jetsmartfilters import crawl_listing
+from rate_limit import polite_get
+from readiness import changed_from, for_site
+from row_sink import RowSink
 
-# Initialize WebDriver (assuming Chrome; ensure chromedriver is installed and in PATH)
-driver = webdriver.Chrome()
-driver.get(url)
+ROWS_FILE = "accme_providers.jsonl"
+OUTPUT_FILE = "accme_providers.xlsx"
 
-# List to hold all extracted data
-data = []
+PAGE_READY = for_site("accme", selectors=(".provider-feed-card-header",), network_idle=0.5, dom_quiet=0.5, max_wait=10)
+DETAILS_READY = for_site("accme-details", network_idle=0.3, dom_quiet=0.5, max_wait=5)
 
-# Page counter for tqdm description
-page = 1
+# URL of the CME Provider Directory
+url = "https://accme.org/cme-provider-directory/"
 
-while True:
-    # Wait for the page to load providers
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.CSS_SELECTOR, ".provider-feed-card-header"))
-    )
+# Page the directory through its JetSmartFilters endpoint (the browser clicks "next" only as a fallback).
+# Whether the HTML served over HTTP carries each card's "More Details" rows is checked on every page:
+# the browser expands them before its snapshot, and pages without them are re-crawled that way.
+LISTING_OVER_HTTP = True
+LISTING_WORKERS = 4
+
+
+# ---------- Directory page ----------
+_EXPAND_JS = """
+var toggles = document.querySelectorAll('.provider-more-details__toggle-label');
+for (var i = 0; i < toggles.length; i++) { toggles[i].click(); }
+return toggles.length;
+"""
+
+_BLOCK_TAGS = {"br", "p", "div", "li", "ul", "ol", "tr", "section", "address",
+               "h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+def expand_details(driver):
+    """Open every card's "More Details" section on the loaded directory page (one script, one wait)."""
+    with timed("expand"):
+        driver.execute_script(_EXPAND_JS)
+    DETAILS_READY.wait(driver)  # until the expanded details stop changing
+
+
+def _card_text(el):
+    # what WebElement.text gives: collapsed whitespace, block elements on separate lines
+    if el is None:
+        return ""
+    chunks = []
+    for node in el.descendants:
+        if isinstance(node, NavigableString):
+            if not isinstance(node, Comment) and node.parent.name not in ("script", "style"):
+                chunks.append(str(node))
+        elif node.name in _BLOCK_TAGS:
+            chunks.append("\n")
+    lines = (" ".join(line.split()) for line in "".join(chunks).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def parse_card(card, page_url, scrape_date):
+    """Row for one .provide-feed-card element of a directory page snapshot."""
+    title = _card_text(card.select_one(".provider-title h2.h3"))
+    accredited_by = _card_text(card.select_one(".eyebrow")).replace("Accredited By: ", "")
+
+    location_elem = card.select_one(".provide-footer-details__address")
+    location = ' '.join(_card_text(location_elem).split()[1:])  # Skip icon text if any
+
+    website_link = card.select_one(".provider-website a")
+    website = urljoin(page_url, website_link["href"]) if website_link and website_link.get("href") else ""
+
+    # Extract details from provider-details
+    details = {}
+    for detail_row in card.select(".provider-details .provider-detail-row"):
+        text = _card_text(detail_row)
+        if ":" in text:
+            key, value = text.split(":", 1)
+            details[key.strip()] = value.strip()
+
+    participates = "Yes" if card.select_one(".provide-footer-details__providership") else "No"
+
+    row = {
+        "Provider Title": title,
+        "Accredited By": accredited_by,
+        "Location": location,
+        "Provider Website": website,
+        "Scrape Date": scrape_date,
+        "Participates in Joint Providership": participates,
+        "Page URL": page_url,
+    }
+    row.update(details)  # Add details as separate columns
+    return row
+
+
+def parse_cards_html(html, page_url):
+    """Rows for every provider card in a directory page's HTML, parsed locally."""
+    soup = BeautifulSoup(html, "lxml")
+    scrape_date = date.today().isoformat()
+    return [parse_card(card, page_url, scrape_date) for card in soup.select(".provide-feed-card")]
+
+
+def extract_cards(driver, page_url):
+    """Rows for the provider cards on the loaded directory page (details expanded)."""
+    return parse_cards_html(driver.page_source, page_url)
+
+
+# ---------- Directory crawl ----------
+def parse_served_page(html):
+    """Rows of a directory page fetched over HTTP; ValueError if its cards come without their details."""
+    rows = parse_cards_html(html, url)
+    if rows and "provider-detail-row" not in html:
+        # the details are then only loaded by "More Details", which only the browser path opens
+        raise ValueError("directory page served without provider details")
+    return rows
+
+
+def crawl_over_http(sink):
+    """Page through the directory via its JetSmartFilters endpoint; False if it cannot be paged that way."""
+    try:
+        pages = crawl_listing(url, parse_served_page, "accme", workers=LISTING_WORKERS, archive=True)
+    except Exception as e:
+        print("AJAX pagination failed, paging in the browser:", e)
+        return False
+    if not pages:
+        return False
+    for page, rows in enumerate(pages, start=1):
+        print(f"Page {page}: {len(rows)} providers")
+        for row in rows:
+            sink.write(row)
+    sink.flush()
+    return True
+
+
+def crawl_in_browser(sink):
+    # Initialize WebDriver (assuming Chrome; ensure chromedriver is installed and in PATH)
+    driver = launch_browser(webdriver.Chrome)
+    polite_get(driver, url)
+
+    # Page counter
+    page = 1
+    navigation = 0.0
+
+    while True:
+        # Pagination is AJAX, so the page number keeps each directory page's trace and snapshot distinct
+        with trace_page("accme", f"{url}#page={page}"):
+            add_time("navigation", navigation)  # the AJAX pagination that loaded this page
+            # Wait for the page to load providers
+            with timed("wait"):
+                WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, ".provider-feed-card-header"))
+                )
+
+            # Get current page URL
+            current_page_url = driver.current_url
+
+            expand_details(driver)
+
+            # one snapshot per directory page; the cards are parsed from it locally
+            with timed("snapshot"):
+                html = driver.page_source
+            archive_page(f"{current_page_url}#page={page}", html, site="accme")
+
+            with timed("extract.cards"):
+                rows = parse_cards_html(html, current_page_url)
+        print(f"Page {page}: {len(rows)} providers")
+        for row in rows:
+            sink.write(row)
+
+        # Checkpoint the rows collected on this page
+        sink.flush()
+
+        # Check for next page button and click if present
+        try:
+            next_button = WebDriverWait(driver, 10).until(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, '.jet-filters-pagination__item[data-value="next"] .jet-filters-pagination__link'))
+            )
+            # the old cards match PAGE_READY too: wait for the first provider title to change
+            page_changed = changed_from(driver, ".provider-title h2.h3", attribute=None)
+            clicked = time.perf_counter()
+            driver.execute_script("arguments[0].click();", next_button)
+            if not PAGE_READY.wait(driver, after=page_changed):
+                print(f"Page {page + 1} did not load; stopping so page {page} is not scraped twice")
+                break
+            navigation = time.perf_counter() - clicked
+            page += 1
+        except:
+            break
 
-    # Get current page URL
-    current_page_url = driver.current_url
+    # Close the driver
+    quit_browser(driver)
 
-    # Find all "More Details" toggle labels and click them to expand
-    toggles = driver.find_elements(By.CSS_SELECTOR, ".provider-more-details__toggle-label")
-    for toggle in toggles:
-        driver.execute_script("arguments[0].click();", toggle)  # Use JS click to avoid issues
-    time.sleep(5)  # Increased wait for details to expand
 
-    # Find all provider cards
-    cards = driver.find_elements(By.CSS_SELECTOR, ".provide-feed-card")
+# ---------- Main ----------
+def main():
+    # Rows are checkpointed to ROWS_FILE once per page; the workbook is written once at the end
+    sink = RowSink(ROWS_FILE, flush_rows=500)
 
-    # Process each card with tqdm for progress
-    for card in tqdm(cards, desc=f"Processing Page {page}"):
-        # Extract Provider Title
-        try:
-            title = card.find_element(By.CSS_SELECTOR, ".provider-title h2.h3").text.strip()
-        except:
-            title = ""
+    if not (LISTING_OVER_HTTP and crawl_over_http(sink)):
+        crawl_in_browser(sink)
 
-        # Extract Accredited By
-        try:
-            accredited_by = card.find_element(By.CSS_SELECTOR, ".eyebrow").text.strip().replace("Accredited By: ", "")
-        except:
-            accredited_by = ""
+    sink.close()
+    print_summary("accme")
 
-        # Extract Location
-        try:
-            location_elem = card.find_element(By.CSS_SELECTOR, ".provide-footer-details__address")
-            location = ' '.join(location_elem.text.strip().split()[1:])  # Skip icon text if any
-        except:
-            location = ""
+    sink.export_excel(OUTPUT_FILE)
 
-        # Extract Provider Website
-        try:
-            website = card.find_element(By.CSS_SELECTOR, ".provider-website a").get_attribute("href")
-        except:
-            website = ""
+    print(f"Scraping completed. Data saved to {OUTPUT_FILE}")
 
-        # Extract details from provider-details
-        details = {}
-        try:
-            details_div = card.find_element(By.CSS_SELECTOR, ".provider-details")
-            detail_rows = details_div.find_elements(By.CSS_SELECTOR, ".provider-detail-row")
-            for row in detail_rows:
-                text = row.text.strip()
-                if ":" in text:
-                    key, value = text.split(":", 1)
-                    details[key.strip()] = value.strip()
-        except:
-            pass
 
-        # Extract Participates in Joint Providership
-        try:
-            joint_elem = card.find_element(By.CSS_SELECTOR, ".provide-footer-details__providership")
-            participates = "Yes"
-        except:
-            participates = "No"
-
-        # Create row dictionary
-        row = {
-            "Provider Title": title,
-            "Accredited By": accredited_by,
-            "Location": location,
-            "Provider Website": website,
-            "Scrape Date": date.today().isoformat(),
-            "Participates in Joint Providership": participates,
-            "Page URL": current_page_url,
-        }
-        row.update(details)  # Add details as separate columns
-
-        data.append(row)
-
-    # Save the current data to Excel after processing each page
-    df = pd.DataFrame(data)
-    df.to_excel("accme_providers.xlsx", index=False)
-
-    # Check for next page button and click if present
-    try:
-        next_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, '.jet-filters-pagination__item[data-value="next"] .jet-filters-pagination__link'))
-        )
-        driver.execute_script("arguments[0].click();", next_button)
-        time.sleep(3)  # Wait for next page to load
-        page += 1
-    except:
-        break
-
-# Close the driver
-driver.quit()
-
-print("Scraping completed. Data saved to cme_providers.xlsx")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import time
 import csv
 import random
 import json
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -11,6 +12,15 @@ from bs4 import BeautifulSoup
 from fake_useragent import UserAgent
 import undetected_chromedriver as uc
 
+from activity_ids import activity_id, register_discovered
+from browser_pool import DriverPool, launch_browser, quit_browser
+from fetch import Fetcher
+from html_archive import default_archive
+from instrumentation import print_summary, timed, trace_page
+from rate_limit import polite_get
+from readiness import changed_from, for_site
+from url_registry import UrlRegistry
+
 # Base URL and Search URL
 BASE_URL = "https://edhub.ama-assn.org"
 SEARCH_URL = "https://edhub.ama-assn.org/collections/5777/neurology"
@@ -18,17 +28,35 @@ SEARCH_URL = "https://edhub.ama-assn.org/collections/5777/neurology"
 # CSV File
 CSV_FILE = "WAVE 1-Activities/ama_articles.csv"
 
-# Initialize CSV file with headers (DOI column removed)
-with open(CSV_FILE, "w", newline="", encoding="utf-8") as file:
-    writer = csv.writer(file)
-    writer.writerow([
-        "Authors", "Title", "Subtitle", "Topic", "Content", "Source Link",
-        "Accepted for Publication", "Published", "Open Access",
-        "Corresponding Author", "Author Contributions",
-        "Conflict of Interest Disclosures", "Funding/Support",
-        "Role of the Funder/Sponsor", "Additional Contributions",
-        "Publisher", "Event Date"
-    ])
+# CSV columns (DOI column removed)
+CSV_HEADERS = [
+    "Authors", "Title", "Subtitle", "Topic", "Content", "Source Link",
+    "Accepted for Publication", "Published", "Open Access",
+    "Corresponding Author", "Author Contributions",
+    "Conflict of Interest Disclosures", "Funding/Support",
+    "Role of the Funder/Sponsor", "Additional Contributions",
+    "Publisher", "Event Date"
+]
+
+# Number of browser sessions scraping articles in parallel
+WORKERS = 3
+# Restart a browser session after this many articles
+RECYCLE_AFTER = 50
+
+fetcher = Fetcher(per_host=WORKERS, archive=default_archive(), site="ama_edhub")
+RESULTS_READY = for_site("ama_edhub", selectors=("a.search-result--title",), network_idle=0.5, dom_quiet=0.5, max_wait=8)
+
+
+def error_row(article_url):
+    """Row for an article that could not be scraped: empty, but still traceable to its Source Link."""
+    row = [""] * len(CSV_HEADERS)
+    row[CSV_HEADERS.index("Source Link")] = article_url
+    return row
+
+
+def article_page_ready(html):
+    """A usable article page has its title block (bot walls and JS shells do not)."""
+    return "content-title" in html
 
 
 # Function to Setup Chrome Driver
@@ -94,16 +122,37 @@ def extract_event_date(soup):
     return ""
 
 
+def load_article_in_browser(article_url, pool):
+    """Render an article page in a pooled browser session and return its HTML."""
+    with pool.lease() as driver:
+        polite_get(driver, article_url)
+        with timed("wait"):
+            try:
+                WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "h1.content-title"))
+                )
+            except Exception:
+                pass
+        return driver.page_source
+
+
 # Function to Extract Article Details
-def scrape_article_details(article_url):
-    """Extract detailed information from a given article page."""
-    driver = setup_driver()
-    driver.get(article_url)
-    time.sleep(random.uniform(4, 6))  # Random sleep to mimic human behavior
+def scrape_article_details(article_url, pool):
+    """Fetch an article page (plain HTTP first, pooled browser if needed) and extract its details."""
+    with trace_page("ama_edhub", article_url):
+        try:
+            page = fetcher.fetch(article_url, is_ready=article_page_ready,
+                                 browser_fallback=lambda url: load_article_in_browser(url, pool))
+        except Exception as e:
+            print(f"❌ ERROR loading {article_url}: {e}")
+            return error_row(article_url)
+
+        with timed("extract.article"):
+            return parse_article_details(BeautifulSoup(page.text, "html.parser"), article_url)
 
-    soup = BeautifulSoup(driver.page_source, "html.parser")
-    driver.quit()
 
+def parse_article_details(soup, article_url):
+    """Extract detailed information from the HTML of an article page."""
     try:
         def extract_text(tag, class_name):
             element = soup.find(tag, class_=class_name)
@@ -205,19 +254,19 @@ def scrape_article_details(article_url):
         ]
     except Exception as e:
         print(f"❌ ERROR scraping {article_url}: {e}")
-        return ["" for _ in range(17)]
+        return error_row(article_url)
 
 
 def load_all_article_links():
     """Extract article links from multiple pages."""
     print("🔍 Opening browser and loading AMA EdHub Neurology page...")
-    driver = setup_driver()
-    driver.get(SEARCH_URL)
+    driver = launch_browser(setup_driver)
+    polite_get(driver, SEARCH_URL)
     time.sleep(5)
 
     input("👉 Apply your desired filters manually, then press Enter to continue scraping...")
 
-    article_links = set()
+    article_links = UrlRegistry(key=activity_id)
 
     def extract_links():
         """Extracts article links from the current page."""
@@ -239,27 +288,47 @@ def load_all_article_links():
             )
             driver.execute_script("arguments[0].scrollIntoView(true);", next_page_element)
             time.sleep(random.uniform(2, 4))
+            # the old results match the ready selector too: wait for the first result to change
+            page_changed = changed_from(driver, "a.search-result--title")
             driver.execute_script("arguments[0].click();", next_page_element)
             print(f"🔄 Navigating to page {page}...")
-            time.sleep(random.uniform(5, 8))
+            RESULTS_READY.wait(driver, after=page_changed)
             extract_links()
             print(f"✅ Page {page}: Total articles found: {len(article_links)}")
         except Exception as e:
             print(f"❌ ERROR navigating to page {page}: {e}")
             break
 
-    driver.quit()
+    quit_browser(driver)
     print(f"✅ Total unique article links extracted: {len(article_links)}")
-    return list(article_links)
+    return article_links.urls()
 
 
-if __name__ == "__main__":
+def scrape_articles(article_links, workers=WORKERS):
+    """
+    Scrape articles concurrently on `workers` pooled browser sessions.
+    Rows are written by this (the calling) thread only, in article_links order.
+    """
+    with open(CSV_FILE, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADERS)
+
+        with DriverPool(setup_driver, size=workers, recycle_after=RECYCLE_AFTER) as pool, \
+                ThreadPoolExecutor(max_workers=workers) as executor:
+            rows = executor.map(lambda url: scrape_article_details(url, pool), article_links)
+            for row in tqdm(rows, total=len(article_links), desc="Scraping articles"):
+                writer.writerow(row)
+                file.flush()
+
+
+def main():
     article_links = load_all_article_links()
+    register_discovered(article_links, "AMA EdHub")
+    scrape_articles(article_links)
+    print_summary("ama_edhub")
+
+    print("✅ Scraping completed. Data saved to CSV.")
 
-    with open(CSV_FILE, "a", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        for article_url in tqdm(article_links, desc="Scraping articles"):
-            article_data = scrape_article_details(article_url)
-            writer.writerow(article_data)
 
-    print("✅ Scraping completed. Data saved to CSV.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
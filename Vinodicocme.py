@@ -13,6 +13,9 @@ import time
 import re
 import os
 import hashlib
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
 from urllib.parse import urljoin
 
 import pandas as pd
@@ -27,9 +30,19 @@ from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 from tqdm import tqdm
 
+from activity_ids import activity_id, register_discovered
+from browser_pool import DriverPool, launch_browser, quit_browser
+from fetch import Fetcher
+from html_archive import default_archive
+from instrumentation import print_summary, timed, trace_page
+from rate_limit import default_scheduler, polite_get
+from readiness import for_site
+from url_registry import UrlRegistry
+
 # ---------- Configuration ----------
 EVENT_LISTING_URL = "https://events.vindicocme.com/en/15kYU86/g/xM5BD6TC2R"
 EVENT_BASE_URL = "https://events.vindicocme.com"
+OUTPUT_FILE = "vindico_live_events.xlsx"
 
 # Keywords to detect disclosure/legal boilerplate (to avoid putting in faculty)
 DISCLOSURE_KEYWORDS = [
@@ -39,6 +52,21 @@ DISCLOSURE_KEYWORDS = [
     "office of medical affairs", "vindico medical education", "compliance"
 ]
 
+# Event pages are scraped by WORKERS threads over HTTP; a thread that needs a browser
+# leases one of at most BROWSER_SESSIONS headless sessions. HTTP and browser requests
+# share the host's budget in the scheduler, so more workers do not mean more load on the site.
+WORKERS = 6
+BROWSER_SESSIONS = 2
+REQUESTS_PER_SECOND = 3.0
+RECYCLE_AFTER = 50
+
+fetcher = Fetcher(per_host=WORKERS, archive=default_archive(), site="vindico")
+default_scheduler().configure("events.vindicocme.com", rate=REQUESTS_PER_SECOND, burst=WORKERS,
+                              max_in_flight=WORKERS)
+# any of the client-rendered content blocks (see event_page_ready)
+EVENT_READY = for_site("vindico", selectors=(".bt-event-overview, .bt-rich-text, .bt-start-end-date",),
+                       network_idle=0.3, dom_quiet=0.3, max_wait=4)
+
 # ---------- Utilities ----------
 def init_driver(headless=False):
     from selenium.webdriver.chrome.options import Options
@@ -58,7 +86,20 @@ def clean_text(text: str) -> str:
         return ""
     return " ".join(text.split())
 
+def parse_document(html: str) -> BeautifulSoup:
+    """The one parsed tree of an event page, shared by every extractor (lxml is several times faster than html.parser)."""
+    return BeautifulSoup(html or "", "lxml")
+
 def strip_tags(html: str) -> str:
+    """
+    Text of a raw HTML slice, which is often cut mid-markup; html.parser keeps
+    the text around stray tags that lxml's fragment parser drops.
+
+    >>> strip_tags("Series Co-Chairs<!-- x -->Series Co-Chairs")
+    'Series Co-Chairs Series Co-Chairs'
+    >>> strip_tags("<p>Jane Doe, MD<script>track()</script>Chair</p> &amp; faculty</di")
+    'Jane Doe, MD Chair & faculty</di'
+    """
     return BeautifulSoup(html, "html.parser").get_text(" ", strip=True)
 
 def looks_like_disclosure(text: str) -> bool:
@@ -274,21 +315,37 @@ KEYHEADS = [
 # --------------------------------------------------------------------------------
 
 
-def extract_after_keyword_from_html(html, keyword):
-    lower = html.lower()
-    k = keyword.lower()
-    idx = lower.find(k)
-    if idx == -1:
+# One scan finds every heading: a zero-width lookahead so overlapping hits are all
+# seen, longest alternative first ("provided by" before "provided").
+_KEYHEAD_KEYS = sorted({kh.lower() for kh in KEYHEADS}, key=len, reverse=True)
+_KEYHEAD_RE = re.compile("(?=(" + "|".join(re.escape(k) for k in _KEYHEAD_KEYS) + "))")
+
+
+def find_keyword_positions(html):
+    """{lower-cased keyword: sorted start offsets} for every KEYHEADS keyword in html."""
+    positions = {k: [] for k in _KEYHEAD_KEYS}
+    for m in _KEYHEAD_RE.finditer(html.lower()):
+        pos = m.start()
+        hit = m.group(1)
+        # a longer keyword hides the shorter ones that are its prefix at the same offset
+        for k in _KEYHEAD_KEYS:
+            if len(k) <= len(hit) and hit.startswith(k):
+                positions[k].append(pos)
+    return positions
+
+
+def _keyword_section(html, k, positions):
+    hits = positions.get(k)
+    if not hits:
         return ""
-    start = idx + len(k)
+    start = hits[0] + len(k)
     next_idx = None
-    for kh in KEYHEADS:
-        if kh.lower() == k:
+    for kh, kh_hits in positions.items():
+        if kh == k:
             continue
-        pos = lower.find(kh.lower(), start)
-        if pos != -1:
-            if next_idx is None or pos < next_idx:
-                next_idx = pos
+        i = bisect_left(kh_hits, start)
+        if i < len(kh_hits) and (next_idx is None or kh_hits[i] < next_idx):
+            next_idx = kh_hits[i]
     end = next_idx if next_idx else min(len(html), start + 1400)
     chunk = html[start:end]
     text = strip_tags(chunk)
@@ -298,17 +355,27 @@ def extract_after_keyword_from_html(html, keyword):
     return text
 
 
+def extract_after_keyword_from_html(html, keyword):
+    return _keyword_section(html, keyword.lower(), find_keyword_positions(html))
+
+
 def extract_all_keywords_from_html(html):
+    positions = find_keyword_positions(html)
     out = {}
     for kw in KEYHEADS:
-        val = extract_after_keyword_from_html(html, kw)
-        out[kw] = clean_text(val)
+        out[kw] = clean_text(_keyword_section(html, kw.lower(), positions))
     return out
 
 
 # ---------- Structured candidate parsing ----------
-def parse_rich_text_sections(html, page_title=None):
-    soup = BeautifulSoup(html, "html.parser")
+def _fake_paragraph(soup, text):
+    p = soup.new_tag("p")
+    p.string = text
+    return p
+
+def parse_rich_text_sections(html, page_title=None, soup=None):
+    if soup is None:
+        soup = parse_document(html)
     candidates = []
     candidates.extend(soup.select("bt-event-overview .content"))
     candidates.extend(soup.select("bt-event-overview .event-content"))
@@ -337,7 +404,7 @@ def parse_rich_text_sections(html, page_title=None):
                 for li in lst.find_all("li"):
                     t = li.get_text(" ", strip=True)
                     if t:
-                        fake.append(BeautifulSoup(f"<p>{t}</p>", "html.parser").p)
+                        fake.append(_fake_paragraph(soup, t))
             if fake:
                 return _parse_paragraph_blocks(fake, page_title=page_title)
 
@@ -348,23 +415,46 @@ def parse_rich_text_sections(html, page_title=None):
                 if t and len(t) > 3:
                     texts.append(t)
         if texts:
-            fake = [BeautifulSoup(f"<p>{t}</p>", "html.parser").p for t in texts]
+            fake = [_fake_paragraph(soup, t) for t in texts]
             return _parse_paragraph_blocks(fake, page_title=page_title)
 
     return None
 
 
 # ---------- Event scraping ----------
-def scrape_event_page(driver, url, save_raw_html_first5=True, raw_dir="raw_html", idx_for_save=None):
-    print(f"Scraping event: {url}")
-    driver.get(url)
+def event_page_ready(html):
+    # the event app renders its content client-side; a bare app shell has none of these
+    return "bt-event-overview" in html or "bt-rich-text" in html or "bt-start-end-date" in html
+
+def load_event_in_browser(driver, url):
+    polite_get(driver, url)
     try:
         WebDriverWait(driver, 8).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
     except TimeoutException:
         pass
-    time.sleep(1.0)
+    EVENT_READY.wait(driver)
+    return driver.page_source
+
+def scrape_event_page(driver, url, save_raw_html_first5=True, raw_dir="raw_html", idx_for_save=None):
+    return _scrape_event(lambda: driver, url, save_raw_html_first5, raw_dir, idx_for_save)
+
+def scrape_event_pooled(pool, url, save_raw_html_first5=True, raw_dir="raw_html", idx_for_save=None):
+    """scrape_event_page for worker threads: a browser is leased from pool only if HTTP is not enough."""
+    with ExitStack() as stack:
+        leased = []
+
+        def browser():
+            if not leased:
+                leased.append(stack.enter_context(pool.lease()))
+            return leased[0]
 
-    page_html = driver.page_source
+        return _scrape_event(browser, url, save_raw_html_first5, raw_dir, idx_for_save)
+
+def _scrape_event(browser, url, save_raw_html_first5, raw_dir, idx_for_save):
+    print(f"Scraping event: {url}")
+    page = fetcher.fetch(url, is_ready=event_page_ready,
+                         browser_fallback=lambda u: load_event_in_browser(browser(), u))
+    page_html = page.text
 
     if save_raw_html_first5 and idx_for_save is not None and idx_for_save <= 5:
         os.makedirs(raw_dir, exist_ok=True)
@@ -372,7 +462,24 @@ def scrape_event_page(driver, url, save_raw_html_first5=True, raw_dir="raw_html"
         with open(os.path.join(raw_dir, safe_name), "w", encoding="utf-8") as f:
             f.write(page_html)
 
-    soup = BeautifulSoup(page_html, "html.parser")
+    def title_from_live_dom():
+        try:
+            elem = browser().find_element(By.XPATH, "//app-root/bt-event-main//h1")
+            return clean_text(elem.text)
+        except Exception:
+            return ""
+
+    with timed("extract.event"):
+        return parse_event_html(url, page_html,
+                                title_fallback=title_from_live_dom if page.via == "browser" else None)
+
+
+def parse_event_html(url, page_html, title_fallback=None):
+    """
+    Build an event row from the page HTML alone (live or archived).
+    title_fallback, if given, is called when the HTML has no usable title.
+    """
+    soup = parse_document(page_html)
 
     title = ""
     h1 = soup.select_one("app-root bt-event-main header h1, bt-event-main header h1, header h1")
@@ -386,12 +493,8 @@ def scrape_event_page(driver, url, save_raw_html_first5=True, raw_dir="raw_html"
             h_any = soup.select_one("h1, h2")
             if h_any and h_any.get_text(strip=True):
                 title = clean_text(h_any.get_text(" ", strip=True))
-            else:
-                try:
-                    elem = driver.find_element(By.XPATH, "//app-root/bt-event-main//h1")
-                    title = clean_text(elem.text)
-                except Exception:
-                    title = ""
+            elif title_fallback is not None:
+                title = title_fallback()
 
     start_date = ""
     end_date = ""
@@ -444,7 +547,7 @@ def scrape_event_page(driver, url, save_raw_html_first5=True, raw_dir="raw_html"
                 if len(loose) > 1 and not end_date:
                     end_date = clean_text(loose[1])
 
-    sections = parse_rich_text_sections(page_html, page_title=title)
+    sections = parse_rich_text_sections(page_html, page_title=title, soup=soup)
     if sections is None:
         kw_data = extract_all_keywords_from_html(page_html)
         sections = {
@@ -557,6 +660,15 @@ def scrape_event_page(driver, url, save_raw_html_first5=True, raw_dir="raw_html"
     return result
 
 
+COLUMNS = [
+    "url", "title", "start_date", "end_date",
+    "activity_chair", "series_co_chairs", "faculty",
+    "overview", "agenda", "learning_objectives",
+    "target_audience", "provided_by", "others",
+    "location", "map_link"
+]
+
+
 # ---------- Listing helpers ----------
 def select_all_dates(driver):
     wait = WebDriverWait(driver, 20)
@@ -653,28 +765,59 @@ def load_all_events(driver, max_rounds_without_growth=3):
         except Exception:
             continue
 
-    seen = set()
-    urls = []
+    seen = UrlRegistry(key=activity_id)
     for h in hrefs:
         if not h:
             continue
-        full = h if h.startswith("http") else urljoin(EVENT_BASE_URL, h)
-        if full not in seen:
-            seen.add(full)
-            urls.append(full)
+        seen.add(h if h.startswith("http") else urljoin(EVENT_BASE_URL, h))
+    urls = seen.urls()
 
     print(f"Total unique event URLs: {len(urls)}")
     return urls
 
 
+# ---------- Event scraping, concurrent ----------
+def scrape_events(event_urls, workers=WORKERS, browser_sessions=BROWSER_SESSIONS):
+    """
+    Scrape every event on a thread pool; rows come back in event_urls order
+    (None for an event that failed).
+    """
+    rows = [None] * len(event_urls)
+    done = [False] * len(event_urls)
+    first5_saved = False
+
+    def work(idx, url):
+        try:
+            with trace_page("vindico", url):
+                return scrape_event_pooled(pool, url, save_raw_html_first5=True,
+                                           raw_dir="raw_html", idx_for_save=idx)
+        except Exception as e:
+            print(f"Error scraping {url}: {e}")
+            return None
+
+    with DriverPool(lambda: init_driver(headless=True), size=browser_sessions,
+                    recycle_after=RECYCLE_AFTER) as pool:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(work, idx, url): idx - 1
+                       for idx, url in enumerate(event_urls, start=1)}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Events", unit="evt"):
+                slot = futures[future]
+                rows[slot] = future.result()
+                done[slot] = True
+                if not first5_saved and len(rows) >= 5 and all(done[:5]):
+                    pd.DataFrame([r for r in rows[:5] if r is not None]).to_excel("preview_first5.xlsx", index=False)
+                    print("Saved preview_first5.xlsx (first 5 rows).")
+                    first5_saved = True
+    return rows
+
+
 # ---------- Main ----------
 def main():
-    driver = init_driver(headless=False)
-    all_rows = []
+    driver = launch_browser(lambda: init_driver(headless=False))
 
     try:
         print("Opening listing:", EVENT_LISTING_URL)
-        driver.get(EVENT_LISTING_URL)
+        polite_get(driver, EVENT_LISTING_URL)
         time.sleep(1.5)
 
         try:
@@ -684,44 +827,25 @@ def main():
             print("select_all_dates raised:", e)
 
         event_urls = load_all_events(driver)
+        register_discovered(event_urls, "Vindico")
 
         if not event_urls:
             print("No event URLs found. Exiting.")
             return
 
         print(f"Found {len(event_urls)} event URLs — scraping...")
-
-        first5_saved = False
-
-        for idx, url in enumerate(tqdm(event_urls, desc="Events", unit="evt"), start=1):
-
-            print(f"\n[{idx}/{len(event_urls)}] {url}")
-
-            row = scrape_event_page(driver, url, save_raw_html_first5=True,
-                                    raw_dir="raw_html", idx_for_save=idx)
-
-            all_rows.append(row)
-
-            if not first5_saved and len(all_rows) >= 5:
-                pd.DataFrame(all_rows[:5]).to_excel("preview_first5.xlsx", index=False)
-                print("Saved preview_first5.xlsx (first 5 rows).")
-                first5_saved = True
-
     finally:
-        driver.quit()
+        quit_browser(driver)
 
-    df = pd.DataFrame(all_rows, columns=[
-        "url", "title", "start_date", "end_date",
-        "activity_chair", "series_co_chairs", "faculty",
-        "overview", "agenda", "learning_objectives",
-        "target_audience", "provided_by", "others",
-        "location", "map_link"
-    ])
+    all_rows = scrape_events(event_urls)
+    print_summary("vindico")
+
+    df = pd.DataFrame([r for r in all_rows if r is not None], columns=COLUMNS)
 
-    out = "vindico_live_events.xlsx"
+    out = OUTPUT_FILE
     df.to_excel(out, index=False)
     print(f"Saved {len(df)} rows to {out}")
 
 
-if _name_ == "_main_":
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,5 +1,7 @@
 import time
-import pandas as pd
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, Comment, NavigableString
 from tqdm import tqdm
 
 from selenium import webdriver
@@ -7,186 +9,193 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
-driver = webdriver.Chrome()
+from activity_ids import activity_id, register_discovered
+from browser_pool import launch_browser, quit_browser
+from html_archive import archive_page
+from instrumentation import field_laps, page_failed, print_summary, timed, trace_page
+from rate_limit import polite_get
+from row_sink import RowSink
+from url_registry import UrlRegistry
 
-base_url = "https://www.continuingcertification.org/activity-search/"
-driver.get(base_url)
+ROWS_FILE = "ABMS_Providers.jsonl"
+OUTPUT_FILE = "ABMS_Providers.xlsx"
 
-index_data = []
-page_bar = tqdm(desc="Collecting pages", unit="page")
+base_url = "https://www.continuingcertification.org/activity-search/"
 
-while True:
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.CSS_SELECTOR, "td.title a"))
-    )
 
-    link_elems = driver.find_elements(By.CSS_SELECTOR, "td.title a")
-    for a in link_elems:
-        href = a.get_attribute("href")
-        title = a.text.strip()
-        if href:
-            index_data.append({"Activity URL": href, "Title": title})
+# ---------- Activity page ----------
+_LINE_BREAKS = {"br", "p", "div", "li", "ul", "ol", "tr", "table", "section",
+                "h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+def _text(el):
+    """Element text as WebElement.text reads it: whitespace collapsed, block elements on their own lines."""
+    if el is None:
+        return ""
+    parts = []
+    for node in el.descendants:
+        if isinstance(node, NavigableString):
+            if not isinstance(node, Comment) and node.parent.name not in ("script", "style"):
+                parts.append(str(node))
+        elif node.name in _LINE_BREAKS:
+            parts.append("\n")
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def _paragraphs_after(soup, heading):
+    """Text of the <p> siblings directly following <h5 class="description">heading</h5>."""
+    h = soup.find(lambda tag: tag.name == "h5" and tag.get("class") == ["description"]
+                  and " ".join(tag.get_text().split()) == heading)
+    if h is None:
+        return ""
+    paras = []
+    for sib in h.find_next_siblings():
+        if sib.name != "p":
+            break
+        text = _text(sib)
+        if text:
+            paras.append(text)
+    return "\n\n".join(paras)
 
-    page_bar.update(1)
 
-    try:
-        next_link = driver.find_element(By.CSS_SELECTOR, "a.next.page-numbers")
-        next_href = next_link.get_attribute("href")
-        if next_href:
-            driver.get(next_href)
-            time.sleep(2)
-        else:
-            break
-    except Exception:
-        break
+def parse_activity_html(html, page_url):
+    """Activity detail fields from one snapshot of the page (taken after "#show-activity" is clicked)."""
+    soup = BeautifulSoup(html, "lxml")
+    row = {}
 
-page_bar.close()
+    register = soup.find(lambda tag: tag.name == "a" and "btn" in (tag.get("class") or [])
+                         and "Register for this Activity" in " ".join(tag.get_text().split()))
+    row["Provider Link"] = urljoin(page_url, register["href"]) if register and register.get("href") else ""
 
-unique_seen = set()
-deduped_index = []
-for item in index_data:
-    url = item["Activity URL"]
-    if url not in unique_seen:
-        unique_seen.add(url)
-        deduped_index.append(item)
+    for prov in soup.select("h2.provider"):
+        text = _text(prov)
+        if text.lower().startswith("cme provider:"):
+            row["CME Provider"] = text.split(":", 1)[1].strip()
+        else:
+            row["CME Provider"] = text
 
-data = []
+    for block in soup.select("div.activity-id, div.expiration, div.format-type, div.credit, div.fee"):
+        label = block.select_one("h4.info-title")
+        value = block.find("span")
+        if label is None or value is None:
+            continue
+        row[_text(label)] = _text(value)
 
-try:
-    for item in tqdm(deduped_index, desc="Scraping activity details"):
-        link = item["Activity URL"]
-        title = item["Title"]
+    row["Description of CME Course"] = _paragraphs_after(soup, "Description of CME Course")
+    row["Disclaimers"] = _paragraphs_after(soup, "Disclaimers")
 
-        driver.get(link)
+    approvals = [_text(p) for p in soup.select("div.approval-table div.approval-list p")]
+    row["ABMS Member Board Approvals by Type"] = "; ".join(a for a in approvals if a)
 
-        try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "h1, h2.provider"))
-            )
-        except Exception:
-            continue
+    row["Commercial Support?"] = _text(soup.select_one("span.commercial-option"))
 
-        row = {
-            "Source URL": base_url,
-            "Activity URL": link,
-            "Title": title,
-        }
+    general_tab = soup.select_one("div.tabs.activity div.tab[data-tab='general']")
+    if general_tab is not None:
+        for h in general_tab.find_all("h4"):
+            key = _text(h)
+            if key:
+                row[key] = _text(h.find_next_sibling("p"))
 
-        try:
-            provider_link_elem = driver.find_element(
-                By.XPATH,
-                "//a[contains(@class,'btn') and contains(normalize-space(),'Register for this Activity')]"
-            )
-            row["Provider Link"] = provider_link_elem.get_attribute("href")
-        except Exception:
-            row["Provider Link"] = ""
+    return row
 
-        info_blocks = driver.find_elements(
-            By.CSS_SELECTOR,
-            "div.activity-id, div.expiration, div.format-type, div.credit, div.fee"
-        )
 
-        provider_elems = driver.find_elements(By.CSS_SELECTOR, "h2.provider")
-        for prov in provider_elems:
-            text = prov.text.strip()
-            if text.lower().startswith("cme provider:"):
-                row["CME Provider"] = text.split(":", 1)[1].strip()
-            else:
-                row["CME Provider"] = text
-
-        for block in info_blocks:
-            try:
-                label_elem = block.find_element(By.CSS_SELECTOR, "h4.info-title")
-                value_elem = block.find_element(By.TAG_NAME, "span")
-                key = label_elem.text.strip()
-                value = value_elem.text.strip()
-                row[key] = value
-            except Exception:
-                continue
+# ---------- Main ----------
+def main():
+    driver = launch_browser(webdriver.Chrome)
+    polite_get(driver, base_url)
 
-        try:
-            desc_h = driver.find_element(
-                By.XPATH,
-                "//h5[@class='description' and normalize-space()='Description of CME Course']"
-            )
-            desc_paras = []
-            siblings = desc_h.find_elements(By.XPATH, "following-sibling::*")
-            for sib in siblings:
-                if sib.tag_name.lower() == "p":
-                    text = sib.text.strip()
-                    if text:
-                        desc_paras.append(text)
-                else:
-                    break
-            row["Description of CME Course"] = "\n\n".join(desc_paras) if desc_paras else ""
-        except Exception:
-            row["Description of CME Course"] = ""
+    index_data = []
+    page_bar = tqdm(desc="Collecting pages", unit="page")
 
-        try:
-            disc_h = driver.find_element(
-                By.XPATH,
-                "//h5[@class='description' and normalize-space()='Disclaimers']"
-            )
-            disc_paras = []
-            siblings = disc_h.find_elements(By.XPATH, "following-sibling::*")
-            for sib in siblings:
-                if sib.tag_name.lower() == "p":
-                    text = sib.text.strip()
-                    if text:
-                        disc_paras.append(text)
-                else:
-                    break
-            row["Disclaimers"] = "\n\n".join(disc_paras) if disc_paras else ""
-        except Exception:
-            row["Disclaimers"] = ""
+    while True:
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "td.title a"))
+        )
 
-        try:
-            approval_div = driver.find_element(By.CSS_SELECTOR, "div.approval-table")
-            approval_ps = approval_div.find_elements(By.CSS_SELECTOR, "div.approval-list p")
-            approvals = [p.text.strip() for p in approval_ps if p.text.strip()]
-            row["ABMS Member Board Approvals by Type"] = "; ".join(approvals) if approvals else ""
-        except Exception:
-            row["ABMS Member Board Approvals by Type"] = ""
+        link_elems = driver.find_elements(By.CSS_SELECTOR, "td.title a")
+        for a in link_elems:
+            href = a.get_attribute("href")
+            title = a.text.strip()
+            if href:
+                index_data.append({"Activity URL": href, "Title": title})
 
-        try:
-            more_btn = WebDriverWait(driver, 5).until(
-                EC.element_to_be_clickable((By.ID, "show-activity"))
-            )
-            driver.execute_script("arguments[0].click();", more_btn)
-            time.sleep(1.5)
-        except Exception:
-            pass
+        page_bar.update(1)
 
         try:
-            commercial_span = driver.find_element(By.CSS_SELECTOR, "span.commercial-option")
-            row["Commercial Support?"] = commercial_span.text.strip()
+            next_link = driver.find_element(By.CSS_SELECTOR, "a.next.page-numbers")
+            next_href = next_link.get_attribute("href")
+            if next_href:
+                polite_get(driver, next_href)
+                time.sleep(2)
+            else:
+                break
         except Exception:
-            row["Commercial Support?"] = ""
+            break
 
-        try:
-            general_tab = driver.find_element(
-                By.CSS_SELECTOR,
-                "div.tabs.activity div.tab[data-tab='general']"
-            )
-            h4_elems = general_tab.find_elements(By.TAG_NAME, "h4")
-            for h in h4_elems:
-                key = h.text.strip()
-                if not key:
-                    continue
-                try:
-                    p_elem = h.find_element(By.XPATH, "following-sibling::p[1]")
-                    value = p_elem.text.strip()
-                except Exception:
-                    value = ""
-                row[key] = value
-        except Exception:
-            pass
+    page_bar.close()
 
-        data.append(row)
-        df = pd.DataFrame(data)
-        df.to_excel("ABMS_Providers.xlsx", index=False)
+    unique_seen = UrlRegistry(key=activity_id)
+    deduped_index = []
+    for item in index_data:
+        if unique_seen.add(item["Activity URL"]):
+            deduped_index.append(item)
+    register_discovered(unique_seen.urls(), "ABMS")
 
-finally:
-    driver.quit()
+    # Checkpoint rows in batches; the workbook is written once at the end.
+    sink = RowSink(ROWS_FILE, flush_rows=25, flush_seconds=30)
 
-print("Scraping completed. Data saved to ABMS_Providers.xlsx")
+    try:
+        items = tqdm(deduped_index, desc="Scraping activity details")
+        for item in items:
+            with trace_page("abms", item["Activity URL"]):
+                link = item["Activity URL"]
+                title = item["Title"]
+
+                polite_get(driver, link)
+
+                with timed("wait"):
+                    try:
+                        WebDriverWait(driver, 10).until(
+                            EC.presence_of_element_located((By.CSS_SELECTOR, "h1, h2.provider"))
+                        )
+                    except Exception:
+                        page_failed("activity content did not load")
+                        continue
+
+                    try:
+                        more_btn = WebDriverWait(driver, 5).until(
+                            EC.element_to_be_clickable((By.ID, "show-activity"))
+                        )
+                        driver.execute_script("arguments[0].click();", more_btn)
+                        time.sleep(1.5)
+                    except Exception:
+                        pass
+                lap = field_laps()
+
+                # one snapshot of the expanded page; every field is read from it locally
+                html = driver.page_source
+                archive_page(link, html, site="abms")
+                lap("snapshot")
+
+                row = {
+                    "Source URL": base_url,
+                    "Activity URL": link,
+                    "Title": title,
+                }
+                row.update(parse_activity_html(html, link))
+                lap("parse")
+
+                sink.write(row)
+
+    finally:
+        sink.close()
+        quit_browser(driver)
+        print_summary("abms")
+        sink.export_excel(OUTPUT_FILE)
+
+    print(f"Scraping completed. Data saved to {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,21 @@ from selenium.webdriver.chrome.service import Service as ChromeService
 from bs4 import BeautifulSoup, Tag
 import pandas as pd
 
+from activity_ids import activity_id, register_discovered
+from browser_pool import launch_browser, quit_browser
+from html_archive import archive_page
+from instrumentation import field_laps, page_failed, print_summary, timed, trace_page
+from jetsmartfilters import crawl_listing
+from rate_limit import polite_get
+from url_registry import UrlRegistry
+
 # ----------------- CONFIG -----------------
 START_URL = "https://academiccme.com/courses/"
 OUTPUT_XLSX = "academiccme_extracted data2.xlsx"
 EARLY_SNAPSHOT = "academiccme_additionalinfo_first5.xlsx"
 MAX_PAGES = 30
+LISTING_OVER_HTTP = True  # page the course grid through the JetSmartFilters endpoint (browser clicks as fallback)
+LISTING_WORKERS = 4
 HEADLESS = True
 CHROMEDRIVER_PATH = None
 # ------------------------------------------
@@ -73,10 +83,10 @@ def extract_grid_items_from_soup(soup, base_url=START_URL):
                 "grid_credits": grid_credits
             })
     # dedupe
-    unique=[]; seen=set()
+    unique=[]; seen=UrlRegistry(key=activity_id)
     for it in items:
-        if it["detail_link"] not in seen:
-            unique.append(it); seen.add(it["detail_link"])
+        if seen.add(it["detail_link"]):
+            unique.append(it)
     return unique
 
 def click_next_on_listing(driver):
@@ -98,6 +108,33 @@ def click_next_on_listing(driver):
         except Exception:
             return False
 
+def parse_listing_html(html):
+    return extract_grid_items_from_soup(BeautifulSoup(html, "lxml"), base_url=START_URL)
+
+def listing_pages_in_browser(driver):
+    polite_get(driver, START_URL)
+    time.sleep(1.0)
+    page_no=0
+    while page_no < MAX_PAGES:
+        page_no += 1
+        yield parse_listing_html(driver.page_source)
+        if not click_next_on_listing(driver):
+            break
+        time.sleep(1.0)
+
+def listing_pages(driver):
+    """Grid items of each listing page: straight from the JetSmartFilters AJAX endpoint, else by clicking "next"."""
+    if LISTING_OVER_HTTP:
+        try:
+            pages = crawl_listing(START_URL, parse_listing_html, "academiccme",
+                                  workers=LISTING_WORKERS, max_pages=MAX_PAGES)
+        except Exception as e:
+            print("AJAX listing failed, paging in the browser:", e)
+            pages = None
+        if pages:
+            return pages
+    return listing_pages_in_browser(driver)
+
 # ------------- Common field heuristics -------------
 def extract_dates_from_text(text):
     start = end = ""
@@ -419,17 +456,14 @@ def find_additional_tab_title_variants(title_text):
             return True
     return False
 
-def extract_detail_page(driver, url):
-    result = {
+def _empty_detail_result(url):
+    return {
         "url": url, "title": "", "start_date": "", "end_date": "", "earned_credits": "",
         "overview_heading": "", "overview": "", "who_should_attend": "", "provided_by": "", "faculty": "",
         "learning_objectives": "", "agenda": "", "additional_info": {}
     }
-    driver.get(url)
-    time.sleep(1.0)
-
-    soup = BeautifulSoup(driver.page_source, "lxml")
 
+def extract_page_fields(result, soup):
     # TITLE FIX: prefer the h2 with the exact classes inside front-matter when available
     fm = soup.find(lambda tag: tag.name=="div" and "front-matter" in " ".join(tag.get("class") or []).lower()) or soup
     title_el = fm.select_one("h2.elementor-heading-title.elementor-size-default")
@@ -444,8 +478,11 @@ def extract_detail_page(driver, url):
     sdt, edt = extract_dates_from_text(page_text)
     result["start_date"], result["end_date"] = sdt, edt
 
-    # Tabs
-    panels = click_tabs_and_get_panels(driver)  # list of (title, html, text)
+def extract_panel_fields(result, panels, get_page_html):
+    """
+    Program overview, faculty, learning objectives and agenda from the tab panels
+    (list of (title, html, text)); get_page_html() supplies the whole page for fallbacks.
+    """
     panel_map = {title.strip().lower(): (html, text) for title, html, text in panels}
 
     # Program Overview: find tab or fallback
@@ -462,7 +499,7 @@ def extract_detail_page(driver, url):
         faculty_text = extract_faculty_from_panel(prog_html)
         # if not found, try the full current document HTML as fallback
         if not faculty_text:
-            faculty_text = extract_faculty_from_panel(driver.page_source)
+            faculty_text = extract_faculty_from_panel(get_page_html())
         result["faculty"] = faculty_text
 
     # Learning objectives
@@ -479,6 +516,22 @@ def extract_detail_page(driver, url):
             ag_html = panel_map[title_key][0]; break
     result["agenda"] = extract_agenda(ag_html or "")
 
+def extract_detail_page(driver, url):
+    result = _empty_detail_result(url)
+    polite_get(driver, url)
+    with timed("wait"):
+        time.sleep(1.0)
+    lap = field_laps()
+
+    soup = BeautifulSoup(driver.page_source, "lxml")
+    extract_page_fields(result, soup)
+    lap("page")
+
+    # Tabs
+    panels = click_tabs_and_get_panels(driver)  # list of (title, html, text)
+    extract_panel_fields(result, panels, lambda: driver.page_source)
+    lap("tabs")
+
     # Additional Course Info: find panel and expand accordions
     add_panel_id = None
     add_panel_html = ""
@@ -509,93 +562,138 @@ def extract_detail_page(driver, url):
                 parent = h.find_parent()
                 add_panel_html = str(parent) if parent else ""
 
-    soup_after = BeautifulSoup(driver.page_source, "lxml")
+    html_after = driver.page_source
+    archive_page(url, html_after, site="academiccme")
+    soup_after = BeautifulSoup(html_after, "lxml")
     add_soup = BeautifulSoup(add_panel_html or "", "lxml") if add_panel_html else soup_after
     additional_dict = extract_accordions_from_soup(add_soup)
     if not additional_dict:
         additional_dict = extract_accordions_from_soup(soup_after)
     result["additional_info"] = additional_dict
+    lap("additional_info")
 
     # final faculty fallback if not found earlier (keeps your original regex fallback)
     if not result.get("faculty"):
         m = re.search(r"(Faculty|COURSE FACULTY|Course Faculty)(.*?)(Learning Objectives|Agenda|Additional Course Info|$)", driver.page_source, re.S|re.I)
         if m:
             result["faculty"] = " ".join(m.group(2).split())
+        lap("faculty_fallback")
 
     return result
 
+# ------------- Offline (archived HTML) -------------
+def panels_from_soup(soup):
+    """The tab panels as click_tabs_and_get_panels returns them, read from static HTML."""
+    panels = []
+    for i, tab in enumerate(soup.select("div.e-n-tabs-heading button.e-n-tab-title")):
+        aria = tab.get("aria-controls")
+        panel = soup.find(id=aria) if aria else None
+        html = panel.decode_contents() if panel else ""
+        text = panel.get_text(" ", strip=True) if panel else ""
+        title = (tab.get_text(" ", strip=True) or f"tab_{i}").strip()
+        panels.append((title, html, text))
+    return panels
+
+def parse_detail_html(url, html):
+    """extract_detail_page for a page that has already been fetched (e.g. from the HTML archive)."""
+    result = _empty_detail_result(url)
+    soup = BeautifulSoup(html, "lxml")
+    extract_page_fields(result, soup)
+
+    panels = panels_from_soup(soup)
+    extract_panel_fields(result, panels, lambda: html)
+
+    add_panel_html = ""
+    for title, panel_html, txt in panels:
+        if find_additional_tab_title_variants(title):
+            add_panel_html = panel_html
+            break
+    if not add_panel_html:
+        h = soup.find(lambda tag: tag.name in ["h2","h3","h4","div","p"] and "additional course" in tag.get_text(" ",strip=True).lower())
+        if h:
+            parent = h.find_parent()
+            add_panel_html = str(parent) if parent else ""
+
+    add_soup = BeautifulSoup(add_panel_html, "lxml") if add_panel_html else soup
+    additional_dict = extract_accordions_from_soup(add_soup)
+    if not additional_dict:
+        additional_dict = extract_accordions_from_soup(soup)
+    result["additional_info"] = additional_dict
+
+    if not result.get("faculty"):
+        m = re.search(r"(Faculty|COURSE FACULTY|Course Faculty)(.*?)(Learning Objectives|Agenda|Additional Course Info|$)", html, re.S|re.I)
+        if m:
+            result["faculty"] = " ".join(m.group(2).split())
+
+    return result
+
+def build_row(idx, url, item, data):
+    """One output row from the listing item and the extracted detail data."""
+    row = {
+        "sno": idx,
+        "url": url,
+        "title": data.get("title",""),
+        "start_date": data.get("start_date",""),
+        "end_date": data.get("end_date",""),
+        "area": item.get("grid_area",""),
+        "type": item.get("grid_type",""),
+        "earned_credits_detail": data.get("earned_credits",""),
+        "grid_credits": item.get("grid_credits",""),
+        "overview_heading": data.get("overview_heading",""),
+        "overview": data.get("overview",""),
+        "who_should_attend": data.get("who_should_attend",""),
+        "provided_by": data.get("provided_by",""),
+        "faculty": data.get("faculty",""),
+        "learning_objectives": data.get("learning_objectives",""),
+        "agenda": data.get("agenda",""),
+    }
+
+    for heading, content in data.get("additional_info", {}).items():
+        col = heading.strip()
+        if col in row and row[col]:
+            row[col] = row[col] + "\n\n" + content
+        else:
+            row[col] = content
+    return row
+
 # -------------- Main --------------
 def main():
-    driver = setup_driver(HEADLESS, CHROMEDRIVER_PATH)
+    driver = launch_browser(lambda: setup_driver(HEADLESS, CHROMEDRIVER_PATH))
     try:
-        driver.get(START_URL)
-        time.sleep(1.0)
-
         all_grid=[]
-        page_no=0
-        while page_no < MAX_PAGES:
-            page_no += 1
-            soup = BeautifulSoup(driver.page_source, "lxml")
-            items = extract_grid_items_from_soup(soup, base_url=START_URL)
+        # the listing root is registered up front so it is never taken for a detail page
+        discovered=UrlRegistry([START_URL], key=activity_id)
+        for page_no, items in enumerate(listing_pages(driver), start=1):
             print(f"[listing page {page_no}] found {len(items)} items")
             for it in items:
-                if not any(existing["detail_link"]==it["detail_link"] for existing in all_grid):
-                    # skip the START_URL itself (double-check)
-                    if it["detail_link"].rstrip("/") == START_URL.rstrip("/"):
-                        continue
+                if discovered.add(it["detail_link"]):
                     all_grid.append(it)
-            if not click_next_on_listing(driver):
-                break
-            time.sleep(1.0)
 
         print(f"Total unique detail pages discovered: {len(all_grid)}")
+        register_discovered([it["detail_link"] for it in all_grid], "academiccme")
 
         rows=[]
         for idx, item in enumerate(all_grid, start=1):
-            url = item["detail_link"]
-            print(f"[{idx}/{len(all_grid)}] scraping {url}")
-            try:
-                data = extract_detail_page(driver, url)
-            except Exception as e:
-                print("Detail extraction error:", e)
-                data = {"url":url,"title":item.get("grid_title",""),"start_date":"","end_date":"","earned_credits":"","overview_heading":"","overview":"","who_should_attend":"","provided_by":"","faculty":"","learning_objectives":"","agenda":"","additional_info":{}}
-
-            row = {
-                "sno": idx,
-                "url": url,
-                "title": data.get("title",""),
-                "start_date": data.get("start_date",""),
-                "end_date": data.get("end_date",""),
-                "area": item.get("grid_area",""),
-                "type": item.get("grid_type",""),
-                "earned_credits_detail": data.get("earned_credits",""),
-                "grid_credits": item.get("grid_credits",""),
-                "overview_heading": data.get("overview_heading",""),
-                "overview": data.get("overview",""),
-                "who_should_attend": data.get("who_should_attend",""),
-                "provided_by": data.get("provided_by",""),
-                "faculty": data.get("faculty",""),
-                "learning_objectives": data.get("learning_objectives",""),
-                "agenda": data.get("agenda",""),
-            }
-
-            for heading, content in data.get("additional_info", {}).items():
-                col = heading.strip()
-                if col in row and row[col]:
-                    row[col] = row[col] + "\n\n" + content
-                else:
-                    row[col] = content
-
-            rows.append(row)
-
-            # Early snapshot after first 5 rows
-            if idx == 5:
-                df_temp = pd.DataFrame(rows)
-                cols = list(df_temp.columns)
-                cols_order = ["sno","url"] + [c for c in cols if c not in ("sno","url")]
-                df_temp = df_temp[cols_order]
-                df_temp.to_excel(EARLY_SNAPSHOT, index=False)
-                print(f"Saved first 5 rows to {EARLY_SNAPSHOT}")
+            with trace_page("academiccme", item["detail_link"]):
+                url = item["detail_link"]
+                print(f"[{idx}/{len(all_grid)}] scraping {url}")
+                try:
+                    data = extract_detail_page(driver, url)
+                except Exception as e:
+                    print("Detail extraction error:", e)
+                    page_failed(f"{type(e).__name__}: {e}")
+                    data = {"url":url,"title":item.get("grid_title",""),"start_date":"","end_date":"","earned_credits":"","overview_heading":"","overview":"","who_should_attend":"","provided_by":"","faculty":"","learning_objectives":"","agenda":"","additional_info":{}}
+
+                rows.append(build_row(idx, url, item, data))
+
+                # Early snapshot after first 5 rows
+                if idx == 5:
+                    df_temp = pd.DataFrame(rows)
+                    cols = list(df_temp.columns)
+                    cols_order = ["sno","url"] + [c for c in cols if c not in ("sno","url")]
+                    df_temp = df_temp[cols_order]
+                    df_temp.to_excel(EARLY_SNAPSHOT, index=False)
+                    print(f"Saved first 5 rows to {EARLY_SNAPSHOT}")
 
         # Final save
         df = pd.DataFrame(rows)
@@ -608,9 +706,10 @@ def main():
         df = df[cols_order]
         df.to_excel(OUTPUT_XLSX, index=False)
         print("Final saved to", OUTPUT_XLSX)
+        print_summary("academiccme")
 
     finally:
-        driver.quit()
+        quit_browser(driver)
 
-if _name_ == "_main_":
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""
+Per-site canonical URLs and stable activity IDs.
+
+Every site names its activities with an ID that survives URL variations:
+the numeric part of cmepassport's /activity/details/202560561, AMA EdHub's
+article number (also carried in bypassSolrId=M_19021406), Medscape's
+viewarticle number, and so on. activity_id() extracts it ("site:id") and
+canonical_url() rebuilds one URL per activity, so the same activity is never
+fetched twice under different spellings and every output can be joined on a
+stable key:
+
+    activity_id("https://edhub.ama-assn.org/jn-learning/module/2841800?resultClick=1")
+    # -> "ama_edhub:2841800"
+
+ActivityIndex persists canonical URL -> activity ID in SQLite across runs.
+Sites without a rule fall back to url_registry.canonicalize_url().
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from url_registry import canonicalize_url
+
+
+class SiteRule:
+    """
+    host: host suffix the rule applies to
+    id_pattern: regex over the URL path; group 1 is the activity ID
+    canonical: format string for the canonical URL, given {id} (None keeps the
+               generic canonical form of the URL)
+    id_param: query parameter that carries the ID when the path does not
+    """
+
+    def __init__(self, site, host, id_pattern=None, canonical=None, id_param=None, id_param_pattern=r"(\d+)"):
+        self.site = site
+        self.host = host
+        self.id_re = re.compile(id_pattern) if id_pattern else None
+        self.canonical = canonical
+        self.id_param = id_param
+        self.id_param_re = re.compile(id_param_pattern)
+
+    def matches(self, host):
+        return host == self.host or host.endswith("." + self.host)
+
+    def extract_id(self, url):
+        parts = urlsplit(url)
+        if self.id_re is not None:
+            m = self.id_re.search(parts.path)
+            if m:
+                return m.group(1)
+        if self.id_param:
+            for value in parse_qs(parts.query).get(self.id_param, []):
+                m = self.id_param_re.search(value)
+                if m:
+                    return m.group(1)
+        return None
+
+
+SITE_RULES = [
+    SiteRule("cmepassport", "cmepassport.org", r"/activity/details/(\d+)",
+             canonical="https://www.cmepassport.org/activity/details/{id}"),
+    # AMA keeps the section in the path (module, audio-player, video-player), so the
+    # canonical URL is the path without the volatile search query
+    SiteRule("ama_edhub", "edhub.ama-assn.org", r"/(\d{5,})(?:/|$)", id_param="bypassSolrId"),
+    SiteRule("medscape", "medscape.org", r"/viewarticle/(\d+)",
+             canonical="https://www.medscape.org/viewarticle/{id}"),
+    # /en/15kYU86/g/xM5BD6TC2R/<slug>-5a2BUm25YEP: the leading segments are shared by
+    # every event; the event's own code is the mixed-case token after the slug's last
+    # hyphen (a slug ending in "-2025" or "-update" has none)
+    SiteRule("vindico", "events.vindicocme.com",
+             r"-((?=[A-Za-z0-9]*[A-Z])(?=[A-Za-z0-9]*[a-z])[A-Za-z0-9]{8,})/?$"),
+    # the remaining sites have no numeric ID in their detail URLs; the slug under the
+    # detail-page prefix is the key, and listing or index pages fall back
+    SiteRule("academiccme", "academiccme.com", r"^/(?:courses|front-matter)/([^/]+)/?$"),
+    SiteRule("primed", "pri-med.com", r"^/online-cme-ce/([^/]+/[^/]+)/?$"),
+    SiteRule("abms", "continuingcertification.org", r"^/activity/([^/]+)/?$"),
+    SiteRule("medpagetoday", "primeinc.org", r"^/((?:online|live|virtual|podcast|print)/[^/]+)/?$"),
+    # myCME's catalog links are Ember routes with no known ID shape: keyed by canonical URL
+    SiteRule("mycme", "mycme.com"),
+]
+
+
+def rule_for(url):
+    host = (urlsplit(url).hostname or "").lower()
+    for rule in SITE_RULES:
+        if rule.matches(host):
+            return rule
+    return None
+
+
+def canonical_url(url):
+    """The one URL used for an activity, whatever variant of it was discovered."""
+    rule = rule_for(url)
+    if rule is not None and rule.canonical:
+        activity = rule.extract_id(url)
+        if activity:
+            return rule.canonical.format(id=activity)
+    return canonicalize_url(url)
+
+
+def activity_id(url):
+    """
+    Stable "site:id" for url; URLs without a recognisable ID are keyed by their canonical form.
+
+    >>> activity_id("https://events.vindicocme.com/en/15kYU86/g/xM5BD6TC2R/8th-annual-ibd-summit-for-fellows-4a2BUmu8Cb")
+    'vindico:4a2BUmu8Cb'
+    >>> activity_id("https://events.vindicocme.com/en/15kYU86/g/xM5BD6TC2R/9th-annual-ibd-summit-for-fellows-5a2BUm25YEP/")
+    'vindico:5a2BUm25YEP'
+    >>> activity_id("https://events.vindicocme.com/en/15kYU86/g/xM5BD6TC2R/obesity-forum-2025")
+    'https://events.vindicocme.com/en/15kYU86/g/xM5BD6TC2R/obesity-forum-2025'
+    >>> activity_id("https://www.continuingcertification.org/activity/2024-ethics-symposium-harm-reduction/")
+    'abms:2024-ethics-symposium-harm-reduction'
+    >>> activity_id("https://primeinc.org/online/cracking-code-menin-inhibitors-2025?utm_medium=mptcme")
+    'medpagetoday:online/cracking-code-menin-inhibitors-2025'
+    >>> activity_id("https://www.continuingcertification.org/activity-search/page/2025/")
+    'https://www.continuingcertification.org/activity-search/page/2025'
+    """
+    rule = rule_for(url)
+    if rule is not None:
+        activity = rule.extract_id(url)
+        if activity:
+            return f"{rule.site}:{activity}"
+    return canonicalize_url(url)
+
+
+DEFAULT_INDEX_PATH = "activity_index.sqlite"
+
+
+class ActivityIndex:
+    """Persistent canonical URL -> activity ID map, shared by every crawler and run."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS activities ("
+            " canonical_url TEXT PRIMARY KEY, activity_id TEXT NOT NULL,"
+            " first_url TEXT NOT NULL, first_seen REAL NOT NULL, last_seen REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS activities_id ON activities (activity_id)")
+
+    def register(self, urls):
+        """Record discovered URLs; returns the activity IDs that had never been seen before."""
+        now = time.time()
+        new_ids = []
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for url in urls:
+                    if not url:
+                        continue
+                    aid = activity_id(url)
+                    known = self._db.execute(
+                        "SELECT 1 FROM activities WHERE activity_id = ? LIMIT 1", (aid,)).fetchone()
+                    self._db.execute(
+                        "INSERT INTO activities (canonical_url, activity_id, first_url, first_seen, last_seen)"
+                        " VALUES (?, ?, ?, ?, ?)"
+                        " ON CONFLICT(canonical_url) DO UPDATE SET last_seen = excluded.last_seen",
+                        (canonical_url(url), aid, url, now, now),
+                    )
+                    if known is None:
+                        new_ids.append(aid)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return new_ids
+
+    def lookup(self, url):
+        """The activity ID recorded for url's canonical form, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT activity_id FROM activities WHERE canonical_url = ?",
+                                   (canonical_url(url),)).fetchone()
+        return row[0] if row else None
+
+    def urls_for(self, aid):
+        with self._lock:
+            rows = self._db.execute("SELECT canonical_url FROM activities WHERE activity_id = ?"
+                                    " ORDER BY first_seen", (aid,)).fetchall()
+        return [r[0] for r in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_index():
+    """The process-wide index in DEFAULT_INDEX_PATH."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ActivityIndex(DEFAULT_INDEX_PATH)
+        return _default
+
+
+def register_discovered(urls, site=""):
+    """Record a crawler's discovered URLs in the default index and report how many activities are new."""
+    try:
+        new_ids = default_index().register(urls)
+    except Exception as e:
+        print(f"Could not update the activity index: {e}")
+        return []
+    print(f"{site or 'Activity index'}: {len(new_ids)} activities not seen in earlier runs")
+    return new_ids
@@ -0,0 +1,454 @@
+"""
+Offline crawl benchmark.
+
+Recorded pages are replayed from a local HTTP server and each site's own
+per-page pipeline runs against it, so throughput and parsing cost can be
+measured (and compared before/after a change) without touching the real
+sites. Fixtures are recorded from the HTML archive (see html_archive.py),
+i.e. from real crawls:
+
+    python benchmark.py record --site cmepassport vindico --limit 200
+    python benchmark.py run                              # every recorded site
+    python benchmark.py run --site medscape accme --workers 2 --latency 0.05
+
+For every site the run reports pages/sec, p50/p95 per-page latency, CPU time
+spent parsing vs time spent waiting (on the server or on Chrome), process
+CPU and peak RSS. Each site runs in a fresh process so its peak RSS is its
+own; results are appended to RESULTS_FILE to track regressions over time.
+
+Sites whose scraper fetches over HTTP (cmepassport, vindico) default to the
+"http" pipeline; the others drive headless Chrome ("browser"), which needs
+Chrome installed. --mode http runs the sites' offline parsers (reparse.py)
+instead; a site without the requested pipeline (medscape has no offline
+parser) is skipped with a warning.
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import html_archive
+from html_archive import DEFAULT_ARCHIVE_DIR, HtmlArchive
+
+FIXTURES_DIR = "bench_fixtures"
+RESULTS_FILE = "benchmark_results.jsonl"
+MANIFEST = "manifest.json"
+DEFAULT_LIMIT = 100
+
+
+# ---------- fixtures ----------
+def record(site, archive_dir=DEFAULT_ARCHIVE_DIR, fixtures_dir=FIXTURES_DIR, limit=DEFAULT_LIMIT):
+    """Copy up to `limit` archived pages of `site` into fixtures_dir/<site>; returns how many."""
+    archive = HtmlArchive(archive_dir)
+    dest = os.path.join(fixtures_dir, site)
+    os.makedirs(dest, exist_ok=True)
+    manifest = []
+    try:
+        for url in archive.urls(site=site):
+            if limit and len(manifest) >= limit:
+                break
+            html = archive.get(url)
+            if not html:
+                continue
+            name = f"{len(manifest):05d}.html"
+            with open(os.path.join(dest, name), "w", encoding="utf-8") as f:
+                f.write(html)
+            manifest.append({"url": url, "file": name})
+    finally:
+        archive.close()
+    with open(os.path.join(dest, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    return len(manifest)
+
+
+class Page:
+    def __init__(self, url, local_url):
+        self.url = url  # where the page was recorded from; what the parser is given
+        self.local_url = local_url  # where the fixture server serves it
+
+
+def load_pages(site, fixtures_dir, base_url, limit=None):
+    with open(os.path.join(fixtures_dir, site, MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if limit:
+        manifest = manifest[:limit]
+    return [Page(m["url"], f"{base_url}/{site}/{m['file']}") for m in manifest]
+
+
+def recorded_sites(fixtures_dir):
+    if not os.path.isdir(fixtures_dir):
+        return []
+    return sorted(d for d in os.listdir(fixtures_dir) if os.path.isfile(os.path.join(fixtures_dir, d, MANIFEST)))
+
+
+# ---------- fixture server ----------
+class FixtureServer:
+    """Serves fixtures_dir over HTTP on 127.0.0.1, optionally adding `latency` seconds per response."""
+
+    def __init__(self, fixtures_dir, latency=0.0):
+        root = os.path.abspath(fixtures_dir)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real sites
+
+            def do_GET(self):
+                path = os.path.normpath(os.path.join(root, unquote(urlsplit(self.path).path).lstrip("/")))
+                if not path.startswith(root + os.sep) or not os.path.isfile(path):
+                    self.send_error(404)
+                    return
+                with open(path, "rb") as f:
+                    body = f.read()
+                if latency:
+                    time.sleep(latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ---------- timing ----------
+class PageTimer:
+    """Wall and thread-CPU time per named phase of one page."""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            w, c = self.phases.get(name, (0.0, 0.0))
+            self.phases[name] = (w + time.perf_counter() - wall, c + time.thread_time() - cpu)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def _rusage():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+
+
+def _rss_mb(maxrss):
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# ---------- per-site pipelines ----------
+class Env:
+    def __init__(self, fetcher=None, pool=None):
+        self.fetcher = fetcher
+        self.pool = pool
+
+
+def _http_pipeline(parse):
+    """The Fetcher path: one keep-alive GET, then the site's parser on the HTML."""
+    def run(env, page, timer):
+        with timer.phase("fetch"):
+            html = env.fetcher.get(page.local_url).text
+        with timer.phase("parse"):
+            return parse(page.url, html)
+    return run
+
+
+def _medscape_browser(env, page, timer):
+    import medscape
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+    from rate_limit import polite_get
+
+    with env.pool.lease() as driver:
+        with timer.phase("fetch"):
+            polite_get(driver, page.local_url)
+            WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, "h1.title")))
+        with timer.phase("parse"):
+            return medscape.extract_activity(driver, page.url)
+
+
+def _accme_browser(env, page, timer):
+    import ACCME
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+    from rate_limit import polite_get
+
+    with env.pool.lease() as driver:
+        with timer.phase("fetch"):
+            polite_get(driver, page.local_url)
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, ".provider-feed-card-header")))
+            ACCME.expand_details(driver)
+        with timer.phase("parse"):
+            return ACCME.extract_cards(driver, page.url)
+
+
+def _academiccme_browser(env, page, timer):
+    import academiacme
+
+    with env.pool.lease() as driver:
+        with timer.phase("page"):  # navigation, tab clicks and panel parsing are interleaved
+            data = academiacme.extract_detail_page(driver, page.local_url)
+    with timer.phase("parse"):
+        return academiacme.build_row(0, page.url, {}, data)
+
+
+def _mycme_browser(env, page, timer):
+    import mycme
+
+    with timer.phase("page"):
+        return mycme.scrape_course_details(page.local_url, env.pool)
+
+
+def _pipelines():
+    import reparse
+    return {
+        "cmepassport": {"http": _http_pipeline(reparse.parse_cmepassport)},
+        "vindico": {"http": _http_pipeline(reparse.parse_vindico)},
+        "academiccme": {"http": _http_pipeline(reparse.parse_academiccme), "browser": _academiccme_browser},
+        "mycme": {"http": _http_pipeline(reparse.parse_mycme), "browser": _mycme_browser},
+        "medscape": {"browser": _medscape_browser},
+        "accme": {"http": _http_pipeline(reparse.parse_accme), "browser": _accme_browser},
+    }
+
+
+SITES = ("cmepassport", "vindico", "academiccme", "mycme", "medscape", "accme")
+DEFAULT_MODE = {"cmepassport": "http", "vindico": "http"}  # the rest scrape through Chrome
+
+
+def _headless_chrome():
+    from selenium import webdriver
+
+    opts = webdriver.ChromeOptions()
+    opts.add_argument("--headless=new")
+    opts.add_argument("--no-sandbox")
+    opts.add_argument("--disable-gpu")
+    opts.add_argument("--window-size=1920,1200")
+    # only the fixture server resolves, so recorded pages cannot reach the real sites' assets
+    opts.add_argument("--host-resolver-rules=MAP * ~NOTFOUND, EXCLUDE 127.0.0.1")
+    return webdriver.Chrome(options=opts)
+
+
+# ---------- run ----------
+def run_site(site, mode=None, fixtures_dir=FIXTURES_DIR, workers=4, latency=0.0, limit=None):
+    """Replay one site's fixtures through its pipeline; returns the result record."""
+    from browser_pool import DriverPool
+    from fetch import Fetcher
+    from rate_limit import default_scheduler
+
+    mode = mode or DEFAULT_MODE.get(site, "browser")
+    pipeline = _pipelines()[site].get(mode)
+    if pipeline is None:
+        raise ValueError(f"{site} has no {mode} pipeline")
+
+    server = FixtureServer(fixtures_dir, latency)
+    base_url = server.start()
+    # the fixture server is not rate limited; waiting is then only the pipeline's own
+    default_scheduler().configure(urlsplit(base_url).netloc, rate=1e6, burst=workers, max_in_flight=workers)
+    env = Env(fetcher=Fetcher(per_host=workers, site=site))
+    if mode == "browser":
+        env.pool = DriverPool(_headless_chrome, size=workers, recycle_after=0)
+
+    pages = load_pages(site, fixtures_dir, base_url, limit)
+
+    def one(page):
+        timer = PageTimer()
+        start = time.perf_counter()
+        try:
+            result = pipeline(env, page, timer)
+            error = None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+        if result is None:
+            rows = 0
+        else:
+            rows = len(result) if isinstance(result, list) else 1
+        return time.perf_counter() - start, timer.phases, rows, error
+
+    # pages the scrapers archive while being benchmarked go to a throwaway archive; the default
+    # archive itself is swapped, since in-process runs may already have opened the real one
+    scratch = tempfile.mkdtemp(prefix="bench_archive_")
+    real_archive = (html_archive.DEFAULT_ARCHIVE_DIR, html_archive._default)
+    html_archive.DEFAULT_ARCHIVE_DIR = scratch
+    html_archive._default = HtmlArchive(scratch)
+
+    usage_before = _rusage()
+    cpu_before = time.process_time()
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(one, pages))
+        elapsed = time.perf_counter() - started
+    finally:
+        if env.pool is not None:
+            env.pool.close()
+        env.fetcher.close()
+        server.stop()
+        html_archive._default.close()
+        html_archive.DEFAULT_ARCHIVE_DIR, html_archive._default = real_archive
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    # throughput and latency are over the pages that went through; failures usually fail fast
+    succeeded = [o for o in outcomes if not o[3]]
+    latencies = [o[0] for o in succeeded]
+    phases = {}
+    for _, page_phases, _, _ in outcomes:
+        for name, (wall, cpu) in page_phases.items():
+            total = phases.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            total["wall"] += wall
+            total["cpu"] += cpu
+    errors = [o[3] for o in outcomes if o[3]]
+
+    result = {
+        "site": site,
+        "mode": mode,
+        "workers": workers,
+        "latency": latency,
+        "pages": len(pages),
+        "rows": sum(o[2] for o in outcomes),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else "",
+        "elapsed": round(elapsed, 3),
+        "pages_per_sec": round(len(succeeded) / elapsed, 2) if elapsed else 0.0,
+        "p50": round(percentile(latencies, 50), 4),
+        "p95": round(percentile(latencies, 95), 4),
+        "phases": {name: {k: round(v, 3) for k, v in t.items()} for name, t in phases.items()},
+        # CPU burnt parsing, vs wall time pages spent off-CPU (server, Chrome, other threads holding the GIL)
+        "parse_cpu": round(phases.get("parse", {}).get("cpu", 0.0), 3),
+        "wait": round(sum(t["wall"] - t["cpu"] for t in phases.values()), 3),
+        "process_cpu": round(time.process_time() - cpu_before, 3),
+    }
+    usage_after = _rusage()
+    if usage_after is not None:
+        self_after, children_after = usage_after
+        children_cpu = (children_after.ru_utime + children_after.ru_stime
+                        - usage_before[1].ru_utime - usage_before[1].ru_stime)
+        result["children_cpu"] = round(children_cpu, 3)  # chromedriver / Chrome, once they have exited
+        result["peak_rss_mb"] = _rss_mb(self_after.ru_maxrss)
+        result["children_peak_rss_mb"] = _rss_mb(children_after.ru_maxrss)
+    return result
+
+
+def run(sites, mode=None, fixtures_dir=FIXTURES_DIR, workers=4, latency=0.0, limit=None, isolate=True):
+    """Benchmark several sites one after the other; each in a fresh process unless isolate is False."""
+    results = []
+    for site in sites:
+        if mode and mode not in _pipelines()[site]:
+            print(f"⚠️ {site}: no {mode} pipeline, skipped (has: {', '.join(_pipelines()[site])})")
+            continue
+        args = (site, mode, fixtures_dir, workers, latency, limit)
+        try:
+            if isolate:
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    result = executor.submit(run_site, *args).result()
+            else:
+                result = run_site(*args)
+        except Exception as e:
+            print(f"❌ {site}: {type(e).__name__}: {e}")
+            continue
+        results.append(result)
+        print_result(result)
+    return results
+
+
+def print_result(r):
+    line = (f"{r['site']:<12} {r['mode']:<7} {r['pages']:>5} pages {r['pages_per_sec']:>8.2f}/s"
+            f"  p50 {r['p50'] * 1000:>7.1f}ms  p95 {r['p95'] * 1000:>7.1f}ms"
+            f"  parse cpu {r['parse_cpu']:>7.2f}s  wait {r['wait']:>7.2f}s")
+    if "peak_rss_mb" in r:
+        line += f"  peak rss {r['peak_rss_mb']:.0f}MB"
+    if r["errors"]:
+        line += f"  ({r['errors']} errors, first: {r['first_error']})"
+    print(line)
+
+
+def save_results(results, path=RESULTS_FILE, label=""):
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    with open(path, "a", encoding="utf-8") as f:
+        for r in results:
+            f.write(json.dumps(dict(r, run_at=stamp, label=label), ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against recorded pages.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="copy archived pages into benchmark fixtures")
+    rec.add_argument("--site", nargs="+", choices=SITES, default=list(SITES))
+    rec.add_argument("--archive", default=DEFAULT_ARCHIVE_DIR, help="archive directory")
+    rec.add_argument("--fixtures", default=FIXTURES_DIR)
+    rec.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="pages per site, 0 for all")
+
+    bench = sub.add_parser("run", help="replay the fixtures and report throughput")
+    bench.add_argument("--site", nargs="+", choices=SITES, default=None, help="default: every recorded site")
+    bench.add_argument("--mode", choices=("http", "browser"), default=None,
+                       help="pipeline to run (default: the one each scraper uses)")
+    bench.add_argument("--fixtures", default=FIXTURES_DIR)
+    bench.add_argument("--workers", type=int, default=4, help="pages in flight (browsers in browser mode)")
+    bench.add_argument("--latency", type=float, default=0.0, help="seconds the fixture server adds per response")
+    bench.add_argument("--limit", type=int, default=None, help="pages per site")
+    bench.add_argument("--label", default="", help="tag stored with the results, e.g. a branch name")
+    bench.add_argument("--in-process", action="store_true", help="run every site in this process")
+    bench.add_argument("--results", default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        for site in args.site:
+            count = record(site, args.archive, args.fixtures, args.limit)
+            print(f"{site}: {count} pages recorded -> {os.path.join(args.fixtures, site)}")
+        return
+
+    sites = args.site or [s for s in SITES if s in recorded_sites(args.fixtures)]
+    if not sites:
+        parser.error(f"no fixtures in {args.fixtures}; run `python benchmark.py record` first")
+    results = run(sites, args.mode, args.fixtures, args.workers, args.latency, args.limit,
+                  isolate=not args.in_process)
+    save_results(results, args.results, args.label)
+    print(f"Results appended to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
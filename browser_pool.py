@@ -0,0 +1,184 @@
+"""
+Bounded pool of long-lived Selenium sessions.
+
+Starting Chrome costs seconds per page, so scrapers lease an already running
+driver instead of creating and quitting one per URL:
+
+    pool = DriverPool(setup_driver, size=2, recycle_after=50)
+    with pool.lease() as driver:
+        driver.get(url)
+        ...
+    pool.close()
+
+Between leases cookies and web storage are cleared so one page cannot leak
+state into the next; a session is quit and replaced after `recycle_after`
+leases, or as soon as it stops responding.
+
+When several scrapers share a process (see run_all.py), set_browser_limit()
+caps how many Chrome sessions run at once across all of them. Scripts that
+hold a single driver start and stop it with launch_browser() / quit_browser()
+so they count against the same budget. A pool only waits for the budget for
+its first session; once it holds one, a lease that finds the budget spent
+waits for one of the pool's own sessions instead, so a pool larger than the
+budget runs with fewer sessions rather than waiting on itself.
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+
+from instrumentation import instrument_driver
+
+
+class _Session:
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+
+
+class DriverPool:
+    def __init__(self, factory, size=1, recycle_after=50):
+        self.factory = factory
+        self.size = max(1, size)
+        self.recycle_after = recycle_after
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
+        self._owned = 0  # sessions alive or being started
+        self._owned_lock = threading.Lock()
+
+    @contextmanager
+    def lease(self):
+        """Borrow a driver for one unit of work (blocks while all `size` sessions are in use)."""
+        self._slots.acquire()
+        session = None
+        try:
+            session = self._take()
+            yield session.driver
+        finally:
+            try:
+                if session is not None:
+                    session.uses += 1
+                    self._release(session)
+            finally:
+                self._slots.release()
+
+    def _take(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._owned_lock:
+                first = self._owned == 0
+                self._owned += 1
+            try:
+                # only the pool's first session waits for the budget
+                driver = launch_browser(self.factory, block=first)
+            except BaseException:
+                self._disown()
+                raise
+            if driver is not None:
+                return _Session(driver)
+            self._disown()
+            # budget spent: wait for one of this pool's sessions to come back
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def _disown(self):
+        with self._owned_lock:
+            self._owned -= 1
+
+    def _release(self, session):
+        if self._closed or (self.recycle_after and session.uses >= self.recycle_after):
+            self._retire(session)
+            return
+        if not reset_session(session.driver):
+            self._retire(session)
+            return
+        self._idle.put(session)
+
+    def _retire(self, session):
+        _quit(session.driver)
+        self._disown()
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._retire(session)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def reset_session(driver):
+    """Clear cookies and web storage; returns False if the session is no longer usable."""
+    try:
+        driver.delete_all_cookies()
+        driver.execute_script(
+            "try { window.localStorage.clear(); } catch (e) {}"
+            "try { window.sessionStorage.clear(); } catch (e) {}"
+        )
+        driver.get("about:blank")
+        return True
+    except Exception:
+        return False
+
+
+def _quit(driver):
+    quit_browser(driver)
+
+
+# ---------- process-wide browser budget ----------
+_browser_slots = None
+_running = set()
+_running_lock = threading.Lock()
+
+
+def set_browser_limit(limit):
+    """Allow at most `limit` browsers at once in this process (None: no limit). Call before starting any."""
+    global _browser_slots
+    _browser_slots = threading.BoundedSemaphore(limit) if limit else None
+
+
+def launch_browser(factory, block=True):
+    """
+    Start a driver with factory(), waiting for a free slot in the browser
+    budget; with block=False returns None instead of waiting.
+    """
+    slots = _browser_slots
+    if slots is not None and not slots.acquire(blocking=block):
+        return None
+    try:
+        driver = instrument_driver(factory())
+    except BaseException:
+        if slots is not None:
+            slots.release()
+        raise
+    if slots is not None:
+        with _running_lock:
+            _running.add(id(driver))
+    return driver
+
+
+def quit_browser(driver):
+    """Quit a driver and give its slot back to the budget."""
+    try:
+        driver.quit()
+    except Exception:
+        pass
+    with _running_lock:
+        counted = id(driver) in _running
+        _running.discard(id(driver))
+    if counted and _browser_slots is not None:
+        _browser_slots.release()
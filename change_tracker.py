@@ -0,0 +1,134 @@
+"""
+Per-URL change tracking for incremental re-crawls.
+
+For every URL the tracker remembers the HTTP validators of the last processed
+response (ETag, Last-Modified), a hash of its normalized content and a hash of
+the row that was extracted from it. A refresh run then:
+
+  * sends If-None-Match / If-Modified-Since, so unchanged pages come back as
+    an empty 304;
+  * skips pages whose body still hashes the same once volatile markup (nonces,
+    CSRF tokens, build ids, comments, whitespace) is stripped;
+  * emits a row only when the extracted values actually differ.
+
+    tracker = ChangeTracker("cme_passport_changes.sqlite")
+    fetcher = Fetcher(tracker=tracker)
+    page = fetcher.get(url, conditional=True)
+    if not page.unchanged:
+        row = parse(page.text)
+        if tracker.row_changed(url, row):
+            delta.write(row)
+    fetcher.commit(page)   # only once the page has been processed
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+_VOLATILE_PATTERNS = [
+    re.compile(r"<!--.*?-->", re.S),
+    re.compile(r'\snonce="[^"]*"'),
+    re.compile(r'<meta[^>]+name="csrf[^"]*"[^>]*>', re.I),
+    re.compile(r'<input[^>]+name="[^"]*(?:csrf|token|nonce)[^"]*"[^>]*>', re.I),
+    re.compile(r'"(?:buildId|nonce|csrfToken|requestId|timestamp)"\s*:\s*"[^"]*"'),
+    re.compile(r"/_next/static/[^/\"']+/"),  # Next.js build directory
+]
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_html(html):
+    """HTML with markup that changes on every request removed, for hashing."""
+    text = html or ""
+    for pattern in _VOLATILE_PATTERNS:
+        text = pattern.sub("", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def content_hash(html):
+    return hashlib.sha256(normalize_html(html).encode("utf-8")).hexdigest()
+
+
+def row_hash(row):
+    data = json.dumps(row, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ChangeTracker:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " etag TEXT NOT NULL DEFAULT '',"
+            " last_modified TEXT NOT NULL DEFAULT '',"
+            " content_hash TEXT NOT NULL DEFAULT '',"
+            " row_hash TEXT NOT NULL DEFAULT '',"
+            " checked_at REAL NOT NULL DEFAULT 0,"
+            " changed_at REAL NOT NULL DEFAULT 0)"
+        )
+
+    def _get(self, url, column):
+        with self._lock:
+            row = self._db.execute(f"SELECT {column} FROM pages WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else ""
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since for the last recorded response of url."""
+        with self._lock:
+            row = self._db.execute("SELECT etag, last_modified FROM pages WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers["If-None-Match"] = row[0]
+        if row and row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def content_unchanged(self, url, digest):
+        return bool(digest) and self._get(url, "content_hash") == digest
+
+    def row_changed(self, url, row):
+        """True when row differs from the last row recorded for url (which is then replaced)."""
+        digest = row_hash(row)
+        if self._get(url, "row_hash") == digest:
+            return False
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO pages (url, row_hash, checked_at, changed_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(url) DO UPDATE SET row_hash = excluded.row_hash,"
+                " checked_at = excluded.checked_at, changed_at = excluded.changed_at",
+                (url, digest, now, now),
+            )
+        return True
+
+    def record(self, url, etag="", last_modified="", digest=""):
+        """Remember the validators and content hash of a response that has been processed."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO pages (url, etag, last_modified, content_hash, checked_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified,"
+                " content_hash = excluded.content_hash, checked_at = excluded.checked_at",
+                (url, etag or "", last_modified or "", digest or "", time.time()),
+            )
+
+    def touch(self, url):
+        with self._lock:
+            self._db.execute("UPDATE pages SET checked_at = ? WHERE url = ?", (time.time(), url))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -1,73 +1,249 @@
+import json
+import os
+import re
 import time
-import pandas as pd
 from tqdm import tqdm
 
+from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
-driver = webdriver.Chrome()
-
-url = "https://www.cmepassport.org/activity/search"
-driver.get(url)
-
-unique_links = set()
-page = 1
-
-page_bar = tqdm(desc="Collecting pages", unit="page")
-
-while True:
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located(
-            (By.CSS_SELECTOR, ".LearnerResultCard_learner-results-card-title__G6rw3")
-        )
-    )
-
-    link_elems = driver.find_elements(
-        By.CSS_SELECTOR,
-        ".LearnerResultCard_learner-results-card-title__G6rw3 a"
-    )
-    links = [link.get_attribute("href") for link in link_elems if link.get_attribute("href")]
-    unique_links.update(links)
-
-    page_bar.update(1)
-
-    try:
-        next_button = WebDriverWait(driver, 10).until(
+from activity_ids import activity_id, canonical_url, register_discovered
+from browser_pool import launch_browser, quit_browser
+from change_tracker import ChangeTracker
+from fetch import Fetcher
+from frontier import DONE, Frontier
+from html_archive import archive_page, default_archive
+from instrumentation import field_laps, print_summary, timed, trace_page
+from rate_limit import polite_get
+from row_sink import RowSink
+from url_registry import UrlRegistry
+
+SEARCH_URL = "https://www.cmepassport.org/activity/search"
+ROWS_FILE = "cme_passport_providers.jsonl"
+OUTPUT_FILE = "cme_passport_providers.xlsx"
+
+# Activity URLs already collected from the search (one per line). The frontier is
+# seeded from it so runs do not have to re-walk the paginated search.
+LINKS_FILE = "all_links.txt"
+# Per-URL crawl state; delete this file to start a crawl from scratch.
+FRONTIER_DB = "cme_passport_frontier.sqlite"
+# Walk the search pages for new activities even when the frontier is already seeded.
+WALK_SEARCH = False
+
+# Refresh run: revisit every finished activity with conditional requests and emit
+# only the rows that changed to DELTA_FILE (they are also folded into OUTPUT_FILE).
+REFRESH = False
+# ETag / Last-Modified / content and row hashes of every processed activity.
+CHANGES_DB = "cme_passport_changes.sqlite"
+DELTA_FILE = "cme_passport_delta.jsonl"
+DELTA_OUTPUT_FILE = "cme_passport_delta.xlsx"
+
+# "json": fetch activity pages over HTTP and read the embedded Next.js page data
+#         (falls back to the browser for pages where that fails)
+# "dom":  read every field from the rendered page through WebDriver
+EXTRACT_MODE = "json"
+
+COLUMNS = [
+    "Source URL", "Activity URL", "Title", "Accredited Provider", "Activity Link",
+    "About this Activity", "Registration", "Fee to Participate", "Activity Type",
+    "Start and End Dates", "Location", "AMA PRA Category 1 Credit™️", "Specialties",
+    "Registered for MOC", "FDA REMS", "Qualifies for MIPS", "Content Outlines",
+    "Providership", "Measured Outcomes", "Commercial Support",
+]
+
+# JSON keys (lower-cased, punctuation removed) that can hold each column's value;
+# the column name itself is always tried first. Only field-specific names belong
+# here: these keys also pick the activity record out of the page data, so generic
+# ones (name, type, url, ...) would pick the wrong object. Booleans with inverted
+# meaning (isFree for the fee) must not be aliased either. A page whose record
+# has no title falls back to the rendered page.
+NEXT_DATA_KEYS = {
+    "Title": ["activitytitle"],
+    "Accredited Provider": ["providername", "accreditedprovidername"],
+    "Activity Link": ["activityurl", "activitylink"],
+    "About this Activity": ["activitydescription"],
+    "Registration": ["registrationtype"],
+    "Fee to Participate": ["participationfee"],
+    "Activity Type": ["activitytypename"],
+    "Location": ["locationname"],
+    "AMA PRA Category 1 Credit™️": ["amapracategory1credit", "amapracredits"],
+    "Specialties": ["specialtynames"],
+    "Registered for MOC": ["registeredformocboards"],
+    "FDA REMS": ["isfdarems"],
+    "Qualifies for MIPS": ["qualifiesformipsimprovementactivity"],
+    "Content Outlines": ["contentoutline"],
+    "Providership": ["providershiptype"],
+    "Measured Outcomes": ["outcomesmeasured"],
+    "Commercial Support": ["hascommercialsupport"],
+}
+
+NEXT_DATA_RE = re.compile(r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+
+fetcher = Fetcher(archive=default_archive(), site="cmepassport")
+
+
+# ---------- Listing ----------
+def collect_activity_links(driver):
+    polite_get(driver, SEARCH_URL)
+
+    unique_links = UrlRegistry(key=activity_id)
+    page = 1
+
+    page_bar = tqdm(desc="Collecting pages", unit="page")
+
+    while True:
+        WebDriverWait(driver, 10).until(
             EC.presence_of_element_located(
-                (By.CSS_SELECTOR, 'button[aria-label="Go to next page"]')
+                (By.CSS_SELECTOR, ".LearnerResultCard_learner-results-card-title__G6rw3")
             )
         )
-        if "Mui-disabled" not in next_button.get_attribute("class"):
-            driver.execute_script("arguments[0].click();", next_button)
-            time.sleep(3)
-            page += 1
-        else:
-            break
-    except Exception:
-        break
-
-page_bar.close()
 
-print(f"Total unique activity links found: {len(unique_links)}")
+        link_elems = driver.find_elements(
+            By.CSS_SELECTOR,
+            ".LearnerResultCard_learner-results-card-title__G6rw3 a"
+        )
+        links = [link.get_attribute("href") for link in link_elems if link.get_attribute("href")]
+        unique_links.add_many(links)
 
-data = []
+        page_bar.update(1)
 
-for link in tqdm(list(unique_links), desc="Processing unique activities"):
-    driver.get(link)
+        try:
+            next_button = WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located(
+                    (By.CSS_SELECTOR, 'button[aria-label="Go to next page"]')
+                )
+            )
+            if "Mui-disabled" not in next_button.get_attribute("class"):
+                driver.execute_script("arguments[0].click();", next_button)
+                time.sleep(3)
+                page += 1
+            else:
+                break
+        except Exception:
+            break
 
+    page_bar.close()
+
+    return unique_links.urls()
+
+
+# ---------- Next.js page data ----------
+def _norm_key(key):
+    return re.sub(r"[^a-z0-9]", "", str(key).lower())
+
+
+def _as_text(value):
+    """Flatten a JSON value into the plain text the rendered page would show."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        if "<" in value and ">" in value:
+            return BeautifulSoup(value, "html.parser").get_text(" ", strip=True)
+        return value.strip()
+    if isinstance(value, list):
+        parts = [_as_text(v) for v in value]
+        return ", ".join(p for p in parts if p)
+    if isinstance(value, dict):
+        for key in ("name", "label", "title", "value", "description"):
+            if key in value:
+                return _as_text(value[key])
+    return ""
+
+
+def _iter_dicts(node):
+    stack = [node]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, dict):
+            yield cur
+            stack.extend(cur.values())
+        elif isinstance(cur, list):
+            stack.extend(cur)
+
+
+def _find_activity_record(page_props):
+    """Pick the object in the page data that carries the most activity fields."""
+    wanted = {_norm_key(c) for c in COLUMNS}
+    for keys in NEXT_DATA_KEYS.values():
+        wanted.update(keys)
+    best, best_score = None, 0
+    for d in _iter_dicts(page_props):
+        score = sum(1 for k in d if _norm_key(k) in wanted)
+        if score > best_score:
+            best, best_score = d, score
+    return best
+
+
+def _lookup(record, column):
+    normalized = {_norm_key(k): v for k, v in record.items()}
+    for key in [_norm_key(column)] + NEXT_DATA_KEYS.get(column, []):
+        if key in normalized:
+            text = _as_text(normalized[key])
+            if text:
+                return text
+    return ""
+
+
+def extract_activity_next_data(html, link):
+    """
+    Build a row from the __NEXT_DATA__ JSON embedded in an activity page, in a
+    single pass and without a browser. Returns None when the page has no usable
+    payload (the caller then falls back to the DOM extractor).
+    """
+    m = NEXT_DATA_RE.search(html or "")
+    if not m:
+        return None
     try:
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located(
-                (By.CSS_SELECTOR, "h4.ActivityDetail_detail-title__b9NVs")
+        data = json.loads(m.group(1))
+    except ValueError:
+        return None
+    record = _find_activity_record(data.get("props", {}).get("pageProps", data))
+    if not record:
+        return None
+
+    row = {"Source URL": SEARCH_URL, "Activity URL": link}
+    for column in COLUMNS[2:]:
+        row[column] = _lookup(record, column)
+
+    if not row["Start and End Dates"]:
+        normalized = {_norm_key(k): v for k, v in record.items()}
+        start = _as_text(normalized.get("startdate"))
+        end = _as_text(normalized.get("enddate"))
+        row["Start and End Dates"] = " - ".join(d for d in (start, end) if d)
+    row["Content Outlines"] = row["Content Outlines"] or "None"
+
+    if not row["Title"]:
+        return None
+    return row
+
+
+# ---------- Rendered page ----------
+def extract_activity_dom(driver, link):
+    polite_get(driver, link)
+
+    with timed("wait"):
+        try:
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located(
+                    (By.CSS_SELECTOR, "h4.ActivityDetail_detail-title__b9NVs")
+                )
             )
-        )
-    except Exception:
-        continue
+        except Exception:
+            return None
+
+    lap = field_laps()
+    archive_page(link, driver.page_source, site="cmepassport")
+    lap("snapshot")
 
     row = {
-        "Source URL": url,
+        "Source URL": SEARCH_URL,
         "Activity URL": link
     }
 
@@ -95,6 +271,8 @@ for link in tqdm(list(unique_links), desc="Processing unique activities"):
     except Exception:
         row["Activity Link"] = ""
 
+    lap("title")
+
     # Extract About this Activity
     try:
         row["About this Activity"] = driver.find_element(
@@ -158,6 +336,8 @@ for link in tqdm(list(unique_links), desc="Processing unique activities"):
     except Exception:
         row["AMA PRA Category 1 Credit™️"] = ""
 
+    lap("details")
+
     # Extract Specialties
     try:
         specialties_lis = driver.find_elements(
@@ -169,6 +349,8 @@ for link in tqdm(list(unique_links), desc="Processing unique activities"):
     except Exception:
         row["Specialties"] = ""
 
+    lap("specialties")
+
     # Extract Registered for MOC
     try:
         moc_elem = driver.find_element(
@@ -184,6 +366,8 @@ for link in tqdm(list(unique_links), desc="Processing unique activities"):
     except Exception:
         row["Registered for MOC"] = ""
 
+    lap("moc")
+
     # Extract FDA REMS
     try:
         row["FDA REMS"] = driver.find_element(
@@ -238,12 +422,106 @@ for link in tqdm(list(unique_links), desc="Processing unique activities"):
         ).text.strip()
     except Exception:
         row["Commercial Support"] = ""
-
-    data.append(row)
-
-    df = pd.DataFrame(data)
-    df.to_excel("cme_passport_providers.xlsx", index=False)
-
-driver.quit()
-
-print("Scraping completed. Data saved to cme_passport_providers.xlsx")
\ No newline at end of file
+    lap("compliance")
+
+    return row
+
+
+def scrape_activity(browser, link, conditional=False):
+    """
+    browser() returns the (lazily started) Selenium driver, only needed for the DOM path.
+    Returns (row, page): page is the HTTP FetchResult when one was made, and row is
+    None when the page is unchanged (page.unchanged) or could not be extracted.
+    """
+    page = None
+    if EXTRACT_MODE == "json":
+        try:
+            page = fetcher.get(link, conditional=conditional)
+            if page.unchanged:
+                return None, page
+            if page.status == 200:
+                with timed("extract.next_data"):
+                    row = extract_activity_next_data(page.text, link)
+                if row is not None:
+                    return row, page
+        except Exception:
+            pass
+    return extract_activity_dom(browser(), link), page
+
+
+# ---------- Main ----------
+def main():
+    driver = None
+
+    def browser():
+        nonlocal driver
+        if driver is None:
+            driver = launch_browser(webdriver.Chrome)
+        return driver
+
+    frontier = Frontier(FRONTIER_DB)
+    fetcher.tracker = ChangeTracker(CHANGES_DB)
+    try:
+        if os.path.exists(LINKS_FILE):
+            added = frontier.seed_from_file(LINKS_FILE, normalize=canonical_url)
+            print(f"Seeded {added} new activity links from {LINKS_FILE}")
+        if WALK_SEARCH or not frontier.counts():
+            links = collect_activity_links(browser())
+            register_discovered(links, "CME Passport")
+            # the frontier is keyed by canonical URL, so URL variants of one activity are crawled once
+            added = frontier.add(canonical_url(u) for u in links)
+            print(f"Added {added} new activity links from the search")
+        if REFRESH:
+            print(f"Refreshing {frontier.requeue(DONE)} finished activities")
+
+        counts = frontier.counts()
+        print(f"Frontier: {counts}")
+
+        # Rows are streamed to ROWS_FILE; the workbook is written once at the end.
+        # A restarted crawl keeps the rows of the activities it already finished.
+        sink = RowSink(ROWS_FILE, resume=REFRESH or counts.get("done", 0) > 0)
+        delta = RowSink(DELTA_FILE) if REFRESH else None
+        unchanged = 0
+
+        try:
+            for link in tqdm(frontier.pending(), desc="Processing unique activities"):
+                try:
+                    with trace_page("cmepassport", link):
+                        row, page = scrape_activity(browser, link, conditional=REFRESH)
+                except Exception as e:
+                    frontier.mark_failed(link, e)
+                    continue
+                if page is not None and page.unchanged:
+                    unchanged += 1
+                elif row is None:
+                    frontier.mark_failed(link, "activity page did not load")
+                    continue
+                elif fetcher.tracker.row_changed(link, row) or not REFRESH:
+                    sink.write(row)
+                    if delta is not None:
+                        delta.write(row)
+                else:
+                    unchanged += 1
+                if page is not None:
+                    fetcher.commit(page, link)
+                frontier.mark_done(link)
+        finally:
+            sink.close()
+            if delta is not None:
+                delta.close()
+    finally:
+        frontier.close()
+        fetcher.tracker.close()
+        if driver is not None:
+            quit_browser(driver)
+
+    print_summary("cmepassport")
+    sink.export_excel(OUTPUT_FILE, columns=COLUMNS, key="Activity URL")
+    print(f"Scraping completed. Data saved to {OUTPUT_FILE}")
+    if delta is not None:
+        delta.export_excel(DELTA_OUTPUT_FILE, columns=COLUMNS)
+        print(f"{delta.count} changed activities ({unchanged} unchanged) saved to {DELTA_OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
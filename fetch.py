@@ -0,0 +1,197 @@
+"""
+HTTP-first page fetching with a browser fallback.
+
+Detail pages that are fully rendered by the server do not need Chrome: a plain
+keep-alive HTTP GET is one or two orders of magnitude cheaper than a Selenium
+page load. Fetcher.fetch() tries HTTP first and only escalates to the browser
+when the site's `is_ready(html)` predicate says the HTML is not usable yet
+(JS-rendered shell, bot wall, error page):
+
+    fetcher = Fetcher()
+    result = fetcher.fetch(url, is_ready=lambda html: "course-detail" in html,
+                           browser_fallback=browser_loader(driver))
+    soup = BeautifulSoup(result.text, "html.parser")
+
+Pass an HtmlArchive (see html_archive.py) to have every page that is fetched,
+over HTTP or through the browser, stored for offline re-parsing, and a
+ChangeTracker (see change_tracker.py) to make conditional requests on re-crawls.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from change_tracker import content_hash
+from instrumentation import add_bytes, timed
+from rate_limit import default_scheduler, polite_get
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 decode "br" responses)
+    _ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    _ACCEPT_ENCODING = "gzip, deflate"
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": _ACCEPT_ENCODING,
+}
+
+
+class FetchResult:
+    def __init__(self, url, text, status=200, via="http"):
+        self.url = url
+        self.text = text
+        self.status = status
+        self.via = via  # "http" or "browser"
+        # set by conditional requests: the page is the same as when it was last committed
+        self.unchanged = False
+        self.etag = ""
+        self.last_modified = ""
+        self.content_hash = ""
+
+    def __repr__(self):
+        return f"FetchResult({self.url!r}, status={self.status}, via={self.via!r})"
+
+
+class Fetcher:
+    """
+    Pooled keep-alive HTTP client (one requests.Session, shared by all threads)
+    with at most `per_host` requests in flight to any one host. Requests are
+    also paced by the host's budget in `scheduler` (see rate_limit.py).
+    """
+
+    def __init__(self, per_host=4, timeout=20, retries=2, headers=None, archive=None, site="", tracker=None,
+                 scheduler=None):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.archive = archive
+        self.site = site
+        self.tracker = tracker
+        self.scheduler = scheduler or default_scheduler()
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(500, 502, 504),
+                      allowed_methods=("GET", "HEAD"))
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(per_host, 4), max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+        return slot
+
+    def get(self, url, conditional=False, **kwargs):
+        """
+        Plain HTTP GET; returns a FetchResult (network errors propagate).
+
+        With conditional=True (and a tracker) the validators recorded for url are
+        sent along, and result.unchanged is set when the server answers 304 or the
+        normalized body hashes the same as last time; unchanged pages are not archived.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        conditional = conditional and self.tracker is not None
+        if conditional:
+            headers = dict(kwargs.pop("headers", None) or {})
+            headers.update(self.tracker.conditional_headers(url))
+            kwargs["headers"] = headers
+        with self._slot(url), self.scheduler.slot(url) as done:
+            with timed("navigation"):
+                resp = self.session.get(url, **kwargs)
+            done(resp.status_code, retry_after=resp.headers.get("Retry-After"))
+        add_bytes(len(resp.content))
+        result = FetchResult(resp.url, resp.text, resp.status_code, via="http")
+        result.etag = resp.headers.get("ETag", "")
+        result.last_modified = resp.headers.get("Last-Modified", "")
+        if resp.status_code == 304:
+            result.unchanged = True
+            return result
+        if resp.status_code == 200:
+            if self.tracker is not None:
+                result.content_hash = content_hash(resp.text)
+                result.unchanged = conditional and self.tracker.content_unchanged(url, result.content_hash)
+            if not result.unchanged:
+                self._archive(url, resp.text)
+        return result
+
+    def post(self, url, data=None, **kwargs):
+        """HTTP POST (e.g. a WordPress admin-ajax.php call) under the same host limits; returns a FetchResult."""
+        kwargs.setdefault("timeout", self.timeout)
+        with self._slot(url), self.scheduler.slot(url) as done:
+            with timed("navigation"):
+                resp = self.session.post(url, data=data, **kwargs)
+            done(resp.status_code, retry_after=resp.headers.get("Retry-After"))
+        add_bytes(len(resp.content))
+        return FetchResult(resp.url, resp.text, resp.status_code, via="http")
+
+    def commit(self, result, url=None):
+        """Record result's validators once it has been processed, so the next conditional GET can skip it."""
+        if self.tracker is None:
+            return
+        url = url or result.url
+        if result.status == 304:
+            self.tracker.touch(url)
+        elif result.status == 200:
+            digest = result.content_hash or content_hash(result.text)
+            self.tracker.record(url, result.etag, result.last_modified, digest)
+
+    def fetch(self, url, is_ready=None, browser_fallback=None, conditional=False):
+        """
+        Return the page HTML, over HTTP when possible.
+
+        The HTTP response is used when it is a 200 and `is_ready(html)` (if given)
+        is true. Otherwise `browser_fallback(url)` -- a callable returning the
+        rendered HTML -- is used; without one the HTTP result is returned as is.
+        A conditional fetch returns an unchanged page without rendering it.
+        """
+        result = None
+        try:
+            result = self.get(url, conditional=conditional)
+            if result.unchanged:
+                return result
+            if result.status == 200 and (is_ready is None or is_ready(result.text)):
+                return result
+        except requests.RequestException:
+            pass
+        if browser_fallback is None:
+            if result is None:
+                raise requests.ConnectionError(f"could not fetch {url}")
+            return result
+        html = browser_fallback(url)
+        self._archive(url, html)
+        return FetchResult(url, html, via="browser")
+
+    def _archive(self, url, html):
+        if self.archive is None:
+            return
+        try:
+            self.archive.put(url, html, site=self.site)
+        except Exception as e:
+            print(f"Could not archive {url}: {e}")
+
+    def close(self):
+        self.session.close()
+
+
+def browser_loader(driver, settle=0.0):
+    """Build a `browser_fallback` that loads the URL in an existing Selenium driver."""
+    def load(url):
+        polite_get(driver, url)
+        if settle:
+            time.sleep(settle)
+        return driver.page_source
+    return load
@@ -0,0 +1,129 @@
+"""
+Persistent crawl frontier backed by SQLite.
+
+Every URL has a status -- pending, done, failed, or retry (with a retry-after
+time) -- that is committed as soon as it changes, so a crawl that is
+interrupted can be restarted and will skip everything already finished:
+
+    frontier = Frontier("cme_passport_frontier.sqlite")
+    frontier.seed_from_file("all_links.txt")
+    for url in frontier.pending():
+        ...
+        frontier.mark_done(url)        # or frontier.mark_failed(url, str(err))
+"""
+
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+RETRY = "retry"
+
+
+class Frontier:
+    def __init__(self, path, max_attempts=3, retry_delay=300):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            " url TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " retry_after REAL NOT NULL DEFAULT 0,"
+            " last_error TEXT NOT NULL DEFAULT '',"
+            " updated_at REAL NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS urls_status ON urls (status, retry_after)")
+
+    def add(self, urls):
+        """Queue URLs that are not known yet; returns how many were new."""
+        now = time.time()
+        with self._lock:
+            before = self._db.total_changes
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO urls (url, updated_at) VALUES (?, ?)",
+                ((u, now) for u in urls if u),
+            )
+            self._db.execute("COMMIT")
+            return self._db.total_changes - before
+
+    def seed_from_file(self, path, normalize=None):
+        """Queue one URL per line from a text file (blank lines are ignored), optionally normalized first."""
+        with open(path, encoding="utf-8") as f:
+            urls = (line.strip() for line in f)
+            if normalize is not None:
+                urls = (normalize(u) for u in urls if u)
+            return self.add(urls)
+
+    def pending(self):
+        """URLs that are due now: pending ones plus retries whose delay has passed, in insertion order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url FROM urls WHERE status = ? OR (status = ? AND retry_after <= ?) ORDER BY rowid",
+                (PENDING, RETRY, time.time()),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def mark_done(self, url):
+        self._set(url, DONE, "")
+
+    def mark_failed(self, url, error=""):
+        """Schedule a retry with exponential backoff, or give up after max_attempts."""
+        with self._lock:
+            row = self._db.execute("SELECT attempts FROM urls WHERE url = ?", (url,)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            now = time.time()
+            if attempts >= self.max_attempts:
+                status, retry_after = FAILED, 0
+            else:
+                status, retry_after = RETRY, now + self.retry_delay * 2 ** (attempts - 1)
+            self._db.execute(
+                "INSERT INTO urls (url, status, attempts, retry_after, last_error, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(url) DO UPDATE SET status = excluded.status, attempts = excluded.attempts,"
+                " retry_after = excluded.retry_after, last_error = excluded.last_error,"
+                " updated_at = excluded.updated_at",
+                (url, status, attempts, retry_after, str(error)[:500], now),
+            )
+
+    def requeue(self, status=DONE):
+        """Move every URL in `status` back to pending (e.g. for a full refresh); returns the count."""
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE urls SET status = ?, attempts = 0, retry_after = 0, updated_at = ? WHERE status = ?",
+                (PENDING, time.time(), status),
+            )
+            return cur.rowcount
+
+    def counts(self):
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM urls GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _set(self, url, status, error):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO urls (url, status, last_error, updated_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(url) DO UPDATE SET status = excluded.status,"
+                " last_error = excluded.last_error, updated_at = excluded.updated_at",
+                (url, status, error, time.time()),
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,199 @@
+"""
+Content-addressed archive of every fetched HTML page.
+
+Pages are compressed (zstd when the `zstandard` package is installed, gzip
+otherwise) and appended to packed segment files; a SQLite index maps
+URL hash -> content hash -> (segment, offset, length). Identical content is
+stored once no matter how many URLs or runs produced it, so improved parsers
+can be re-run offline over the whole corpus without re-crawling:
+
+    archive = default_archive()
+    archive.put(url, driver.page_source, site="medscape")
+    ...
+    for url, html in HtmlArchive("html_archive").iter_pages(site="medscape"):
+        ...
+
+Each writer appends to a segment of its own, so several scrapers (threads or
+processes) can share one archive directory.
+"""
+
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_ARCHIVE_DIR = "html_archive"
+SEGMENT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def url_hash(url):
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _compress(data):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "gzip", gzip.compress(data, compresslevel=6)
+
+
+def _decompress(codec, blob):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("archive segment is zstd-compressed; install the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
+class HtmlArchive:
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR, segment_max_bytes=SEGMENT_MAX_BYTES):
+        self.root = root
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.Lock()
+        self._db = None
+        self._segment = None  # (name, file handle) this writer appends to
+        self._readers = {}
+
+    # ---------- storage ----------
+    def _open(self):
+        if self._db is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.root, "index.sqlite"),
+                                       isolation_level=None, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                " content_hash TEXT PRIMARY KEY, segment TEXT NOT NULL, offset INTEGER NOT NULL,"
+                " length INTEGER NOT NULL, codec TEXT NOT NULL, raw_length INTEGER NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " id INTEGER PRIMARY KEY, url TEXT NOT NULL, url_hash TEXT NOT NULL,"
+                " content_hash TEXT NOT NULL, site TEXT NOT NULL DEFAULT '', fetched_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS pages_url ON pages (url_hash, id)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS pages_site ON pages (site, id)")
+        return self._db
+
+    def _writable_segment(self, size):
+        if self._segment is not None:
+            name, fh = self._segment
+            if fh.tell() + size <= self.segment_max_bytes:
+                return name, fh
+            fh.close()
+        name = f"segment-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{threading.get_ident() % 10000:04d}.pack"
+        fh = open(os.path.join(self.root, name), "ab")
+        self._segment = (name, fh)
+        return name, fh
+
+    def _read_blob(self, segment, offset, length):
+        fh = self._readers.get(segment)
+        if fh is None:
+            fh = self._readers[segment] = open(os.path.join(self.root, segment), "rb")
+        fh.seek(offset)
+        return fh.read(length)
+
+    # ---------- public API ----------
+    def put(self, url, html, site=""):
+        """
+        Archive one fetched page; returns its content hash. Content that is
+        already stored is not written again, and re-fetching a URL whose
+        latest content is unchanged adds nothing.
+        """
+        if not html:
+            return None
+        data = html.encode("utf-8") if isinstance(html, str) else html
+        digest = content_hash(data)
+        uhash = url_hash(url)
+        with self._lock:
+            db = self._open()
+            latest = db.execute(
+                "SELECT content_hash FROM pages WHERE url_hash = ? ORDER BY id DESC LIMIT 1", (uhash,)
+            ).fetchone()
+            if latest and latest[0] == digest:
+                return digest
+            if db.execute("SELECT 1 FROM blobs WHERE content_hash = ?", (digest,)).fetchone() is None:
+                codec, blob = _compress(data)
+                name, fh = self._writable_segment(len(blob))
+                offset = fh.tell()
+                fh.write(blob)
+                fh.flush()
+                db.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+                           (digest, name, offset, len(blob), codec, len(data)))
+            db.execute("INSERT INTO pages (url, url_hash, content_hash, site, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                       (url, uhash, digest, site or "", time.time()))
+        return digest
+
+    def get(self, url):
+        """Latest archived HTML for url, or None."""
+        with self._lock:
+            row = self._open().execute(
+                "SELECT b.segment, b.offset, b.length, b.codec FROM pages p"
+                " JOIN blobs b ON b.content_hash = p.content_hash"
+                " WHERE p.url_hash = ? ORDER BY p.id DESC LIMIT 1",
+                (url_hash(url),),
+            ).fetchone()
+            if row is None:
+                return None
+            return _decompress(row[3], self._read_blob(row[0], row[1], row[2])).decode("utf-8")
+
+    def urls(self, site=None):
+        """Archived URLs (each once, in first-archived order), optionally for one site."""
+        query = "SELECT url, MIN(id) AS first_id FROM pages"
+        args = ()
+        if site:
+            query += " WHERE site = ?"
+            args = (site,)
+        query += " GROUP BY url_hash ORDER BY first_id"
+        with self._lock:
+            return [r[0] for r in self._open().execute(query, args).fetchall()]
+
+    def iter_pages(self, site=None):
+        """Yield (url, html) for the latest version of every archived page."""
+        for url in self.urls(site):
+            html = self.get(url)
+            if html is not None:
+                yield url, html
+
+    def close(self):
+        with self._lock:
+            if self._segment is not None:
+                self._segment[1].close()
+                self._segment = None
+            for fh in self._readers.values():
+                fh.close()
+            self._readers = {}
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_archive():
+    """The process-wide archive in DEFAULT_ARCHIVE_DIR, shared by every scraper."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HtmlArchive(DEFAULT_ARCHIVE_DIR)
+        return _default
+
+
+def archive_page(url, html, site=""):
+    """Store a page in the default archive; archiving problems never break a scrape."""
+    try:
+        default_archive().put(url, html, site=site)
+    except Exception as e:
+        print(f"Could not archive {url}: {e}")
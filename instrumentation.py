@@ -0,0 +1,309 @@
+"""
+Per-page timing and fetch instrumentation shared by every scraper.
+
+Each page a scraper processes is traced: time spent navigating, waiting for
+the page to be ready and extracting each group of fields, bytes received and
+the WebDriver commands issued (every driver started through
+browser_pool.launch_browser is instrumented). One JSON line per page goes to
+TRACE_FILE, and print_summary() gives the end-of-run totals for a site:
+
+    with trace_page("medscape", link):
+        polite_get(driver, link)          # recorded as "navigation"
+        READY.wait(driver)                # recorded as "wait"
+        lap = field_laps()
+        ...                               # title fields
+        lap("title")                      # recorded as "extract.title"
+    ...
+    print_summary("medscape")
+
+polite_get(), Fetcher and Readiness.wait() report their own time, so most
+call sites only need trace_page() and, where it matters, field_laps().
+Outside trace_page() all of this is a no-op.
+"""
+
+import json
+import math
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+TRACE_FILE = "scrape_trace.jsonl"  # None: keep the summaries, write no trace
+
+# transfer sizes the browser reports for the document and the resources it loaded
+_BYTES_JS = (
+    "var t = 0, n = performance.getEntriesByType('navigation')[0];"
+    "if (n) { t += n.transferSize || n.encodedBodySize || 0; }"
+    "performance.getEntriesByType('resource').forEach(function (r) { t += r.transferSize || 0; });"
+    "return t;"
+)
+
+_local = threading.local()
+
+
+class PageTrace:
+    def __init__(self, site, url):
+        self.site = site
+        self.url = url
+        self.started = time.time()
+        self.total = 0.0
+        self.timings = {}  # phase -> seconds
+        self.bytes = 0
+        self.commands = Counter()  # WebDriver command -> count
+        self.command_time = 0.0
+        self.error = ""
+
+    def add(self, phase, seconds):
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def to_dict(self):
+        return {
+            "site": self.site,
+            "url": self.url,
+            "started": round(self.started, 3),
+            "total": round(self.total, 4),
+            "timings": {k: round(v, 4) for k, v in self.timings.items()},
+            "bytes": self.bytes,
+            "commands": sum(self.commands.values()),
+            "command_time": round(self.command_time, 4),
+            "command_counts": dict(self.commands),
+            "error": self.error,
+        }
+
+
+class _SiteSummary:
+    def __init__(self):
+        self.pages = 0
+        self.errors = 0
+        self.totals = []
+        self.timings = {}
+        self.bytes = 0
+        self.commands = Counter()
+        self.command_time = 0.0
+        self.first_started = None
+        self.last_finished = None
+
+
+class Tracer:
+    def __init__(self, path=TRACE_FILE):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+        self._sites = {}
+
+    @contextmanager
+    def page(self, site, url):
+        """Trace the work on one page done by the current thread."""
+        trace = PageTrace(site, url)
+        outer = getattr(_local, "page", None)
+        _local.page = trace
+        start = time.perf_counter()
+        try:
+            yield trace
+        except GeneratorExit:
+            raise  # a generator tracing its items was closed early, not a failure
+        except BaseException as e:
+            trace.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            trace.total = time.perf_counter() - start
+            _local.page = outer
+            self._record(trace)
+
+    def _record(self, trace):
+        with self._lock:
+            s = self._sites.setdefault(trace.site, _SiteSummary())
+            s.pages += 1
+            s.errors += bool(trace.error)
+            s.totals.append(trace.total)
+            for phase, seconds in trace.timings.items():
+                s.timings[phase] = s.timings.get(phase, 0.0) + seconds
+            s.bytes += trace.bytes
+            s.commands.update(trace.commands)
+            s.command_time += trace.command_time
+            s.first_started = trace.started if s.first_started is None else min(s.first_started, trace.started)
+            s.last_finished = time.time()
+            if self.path:
+                self._write(dict(trace.to_dict(), type="page"))
+
+    def _write(self, record):
+        try:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+        except OSError as e:
+            print(f"Could not write the trace to {self.path}: {e}")
+            self.path = None
+
+    def summary(self, site):
+        """End-of-run totals for one site (None if no page of it was traced)."""
+        with self._lock:
+            s = self._sites.get(site)
+            if s is None:
+                return None
+            pages = s.pages
+            elapsed = (s.last_finished - s.first_started) if pages else 0.0
+            return {
+                "site": site,
+                "pages": pages,
+                "errors": s.errors,
+                "elapsed": round(elapsed, 2),
+                "pages_per_sec": round(pages / elapsed, 3) if elapsed else 0.0,
+                "p50": round(_percentile(s.totals, 50), 3),
+                "p95": round(_percentile(s.totals, 95), 3),
+                "mean_timings": {k: round(v / pages, 4) for k, v in sorted(s.timings.items())},
+                "bytes": s.bytes,
+                "commands": sum(s.commands.values()),
+                "commands_per_page": round(sum(s.commands.values()) / pages, 1),
+                "command_time": round(s.command_time, 2),
+                "top_commands": dict(s.commands.most_common(8)),
+            }
+
+    def print_summary(self, site):
+        summary = self.summary(site)
+        if summary is None:
+            return None
+        print(f"\n{site}: {summary['pages']} pages ({summary['errors']} errors) in {summary['elapsed']:.0f}s,"
+              f" {summary['pages_per_sec']:.2f} pages/s, p50 {summary['p50']:.2f}s, p95 {summary['p95']:.2f}s")
+        for phase, seconds in summary["mean_timings"].items():
+            print(f"  {phase:<28} {seconds:>8.3f}s / page")
+        print(f"  {'bytes received':<28} {summary['bytes']:>12,}")
+        if summary["commands"]:
+            print(f"  {'WebDriver commands':<28} {summary['commands_per_page']:>8.1f} / page"
+                  f"  ({summary['command_time']:.1f}s in total)")
+            print("  " + ", ".join(f"{cmd} x{n}" for cmd, n in summary["top_commands"].items()))
+        with self._lock:
+            if self.path:
+                self._write(dict(summary, type="summary"))
+        return summary
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_tracer():
+    """The process-wide tracer writing to TRACE_FILE."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Tracer(TRACE_FILE)
+        return _default
+
+
+def trace_page(site, url):
+    return default_tracer().page(site, url)
+
+
+def print_summary(site):
+    return default_tracer().print_summary(site)
+
+
+# ---------- recording from inside a page ----------
+def current_page():
+    """The PageTrace the current thread is working on, or None."""
+    return getattr(_local, "page", None)
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to `phase` of the current page."""
+    trace = current_page()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(phase, time.perf_counter() - start)
+
+
+def page_failed(reason):
+    """
+    Count the current page as an error of its site. For failures the scraper
+    handles and moves past (`except: continue`), which trace_page() cannot see.
+    """
+    trace = current_page()
+    if trace is not None and not trace.error:
+        trace.error = reason
+
+
+def add_time(phase, seconds):
+    trace = current_page()
+    if trace is not None:
+        trace.add(phase, seconds)
+
+
+def field_laps(prefix="extract"):
+    """
+    lap(group) adds the time since the previous lap (or since field_laps() was
+    called) to "<prefix>.<group>", so a long run of field lookups can be split
+    into groups without re-indenting it.
+    """
+    last = [time.perf_counter()]
+
+    def lap(group):
+        now = time.perf_counter()
+        trace = current_page()
+        if trace is not None:
+            trace.add(f"{prefix}.{group}", now - last[0])
+        last[0] = now
+    return lap
+
+
+def add_bytes(count):
+    trace = current_page()
+    if trace is not None and count:
+        trace.bytes += count
+
+
+# ---------- WebDriver ----------
+def instrument_driver(driver):
+    """Count the WebDriver commands issued through driver (and the time they take) per traced page."""
+    if getattr(driver, "_traced_execute", None) is not None:
+        return driver
+    execute = driver.execute
+
+    def traced_execute(driver_command, params=None):
+        trace = current_page()
+        if trace is None or getattr(_local, "quiet", False):
+            return execute(driver_command, params)
+        start = time.perf_counter()
+        try:
+            return execute(driver_command, params)
+        finally:
+            trace.command_time += time.perf_counter() - start
+            trace.commands[driver_command] += 1
+
+    driver._traced_execute = traced_execute
+    # WebElement commands go through their parent driver's execute as well
+    driver.execute = traced_execute
+    return driver
+
+
+def record_browser_bytes(driver):
+    """Add what the browser has received for the loaded page; the probe itself is not counted."""
+    if current_page() is None:
+        return
+    _local.quiet = True
+    try:
+        add_bytes(int(driver.execute_script(_BYTES_JS) or 0))
+    except Exception:
+        pass
+    finally:
+        _local.quiet = False
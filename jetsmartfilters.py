@@ -0,0 +1,229 @@
+"""
+Direct pagination of WordPress listings driven by JetSmartFilters.
+
+The academiccme course grid and the ACCME provider directory are JetEngine
+listings whose "next page" button does not navigate: it posts the listing's
+query to admin-ajax.php (action=jet_smart_filters) and swaps in the HTML
+fragment that comes back. Everything that request needs is in the
+JetSmartFilterSettings object the listing page embeds, so after one plain GET
+of page 1 every other page can be requested directly, several at a time,
+without a browser:
+
+    pages = crawl_listing(START_URL, lambda html: extract_grid_items_from_soup(
+        BeautifulSoup(html, "lxml")), site="academiccme")
+    if pages is None:
+        ...  # no JetSmartFilters settings on the page: click through in the browser
+
+crawl_listing() returns the parsed result of every page in page order.
+"""
+
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from fetch import Fetcher
+from html_archive import archive_page
+from instrumentation import timed, trace_page
+
+AJAX_ACTION = "jet_smart_filters"
+LISTING_WORKERS = 4
+
+_SETTINGS_RE = re.compile(r"JetSmartFilterSettings\s*=\s*")
+_PROVIDER_RE = re.compile(r'data-(?:apply|content)-provider="([^"]+)"')
+_QUERY_ID_RE = re.compile(r'data-query-id="([^"]*)"')
+
+_AJAX_HEADERS = {
+    "Accept": "application/json, text/javascript, */*; q=0.01",
+    "X-Requested-With": "XMLHttpRequest",
+}
+
+
+# ---------- Settings embedded in the listing page ----------
+def parse_settings(html):
+    """The JetSmartFilterSettings object of a listing page, or None if it has none."""
+    match = _SETTINGS_RE.search(html or "")
+    if not match:
+        return None
+    try:
+        settings, _ = json.JSONDecoder().raw_decode(html, match.end())
+    except ValueError:
+        return None
+    return settings if isinstance(settings, dict) else None
+
+
+class Listing:
+    """The AJAX query behind one JetSmartFilters listing (provider + query id)."""
+
+    def __init__(self, ajax_url, provider, query_id, defaults, settings, props, page_url):
+        self.ajax_url = ajax_url
+        self.provider = provider
+        self.query_id = query_id or "default"
+        self.defaults = defaults or {}
+        self.settings = settings or {}
+        self.props = props or {}
+        self.page_url = page_url
+
+    @property
+    def max_pages(self):
+        """Page count reported by the listing (None if it does not say)."""
+        try:
+            return int(self.props.get("max_num_pages")) or None
+        except (TypeError, ValueError):
+            return None
+
+    def form(self, page):
+        """Form fields of the request for `page`, as the filters script sends them."""
+        data = {
+            "action": AJAX_ACTION,
+            "provider": f"{self.provider}/{self.query_id}",
+            "defaults": self.defaults,
+            "settings": self.settings,
+            "props": self.props,
+            "paged": page,
+        }
+        return php_form_pairs(data)
+
+    def __repr__(self):
+        return f"Listing({self.provider}/{self.query_id}, max_pages={self.max_pages})"
+
+
+def listing_from_html(html, page_url, provider=None, query_id=None):
+    """
+    Listing for the JetSmartFilters query on a page, or None when the page has
+    no usable settings. Without an explicit provider the one the page's
+    pagination/filters apply to is used, else the first one in the settings.
+    """
+    js = parse_settings(html)
+    if not js or not js.get("ajaxurl"):
+        return None
+    providers = js.get("settings") or {}
+    if provider is None:
+        match = _PROVIDER_RE.search(html)
+        provider = match.group(1) if match and match.group(1) in providers else next(iter(providers), None)
+    if provider is None:
+        return None
+    if query_id is None:
+        match = _QUERY_ID_RE.search(html)
+        query_id = (match.group(1) if match else "") or "default"
+    if query_id not in providers.get(provider, {}):
+        return None
+
+    def part(name):
+        return (js.get(name) or {}).get(provider, {}).get(query_id) or {}
+
+    return Listing(js["ajaxurl"], provider, query_id, part("queries"), part("settings"), part("props"), page_url)
+
+
+# ---------- Form encoding ----------
+def php_form_pairs(value, prefix=""):
+    """
+    Flatten nested dicts/lists into the bracketed form fields PHP rebuilds
+    into arrays (what jQuery.param sends): {"a": {"b": [1, 2]}} ->
+    [("a[b][]", "1"), ("a[b][]", "2")]. Empty containers are left out.
+    """
+    if isinstance(value, dict):
+        pairs = []
+        for key, item in value.items():
+            pairs.extend(php_form_pairs(item, f"{prefix}[{key}]" if prefix else str(key)))
+        return pairs
+    if isinstance(value, (list, tuple)):
+        pairs = []
+        for i, item in enumerate(value):
+            nested = isinstance(item, (dict, list, tuple))
+            pairs.extend(php_form_pairs(item, f"{prefix}[{i}]" if nested else f"{prefix}[]"))
+        return pairs
+    if value is None:
+        return [(prefix, "")]
+    if isinstance(value, bool):
+        return [(prefix, "true" if value else "false")]
+    return [(prefix, str(value))]
+
+
+# ---------- Fetching pages ----------
+def fetch_page(fetcher, listing, page):
+    """HTML fragment of listing page `page` (requests errors propagate)."""
+    headers = dict(_AJAX_HEADERS, Referer=listing.page_url)
+    result = fetcher.post(listing.ajax_url, data=listing.form(page), headers=headers)
+    if result.status != 200:
+        raise ValueError(f"{listing.ajax_url} answered {result.status} for page {page}")
+    payload = json.loads(result.text)
+    content = payload.get("content") if isinstance(payload, dict) else None
+    if content is None:
+        raise ValueError(f"no listing content in the response for page {page}")
+    return content
+
+
+def crawl_listing(page_url, parse, site, fetcher=None, workers=LISTING_WORKERS, max_pages=None,
+                  provider=None, archive=False):
+    """
+    parse(html) of every page of the listing at page_url, in page order, or
+    None when the listing cannot be paged over HTTP (the caller falls back to
+    the browser). Page 1 is the listing page itself; the rest are fetched
+    `workers` at a time. When the listing does not report its page count,
+    pages are requested in batches until one parses to nothing.
+
+    A page that should have content but parses to nothing raises ValueError:
+    page 1, any page up to the reported count, or -- count unknown -- page 2 or
+    a page before one that has content. The request was then rejected or went
+    to the wrong query, and the caller must not take page 1 for the whole
+    listing.
+
+    Each page is traced as "<page_url>#page=N" of `site`, and with
+    archive=True its HTML is archived under that URL too.
+    """
+    own_fetcher = fetcher is None
+    fetcher = fetcher or Fetcher(per_host=workers, site=site)
+    try:
+        with trace_page(site, f"{page_url}#page=1"):
+            first = fetcher.get(page_url)
+            listing = listing_from_html(first.text, page_url, provider) if first.status == 200 else None
+            if listing is None:
+                return None
+            results = [_parse_page(parse, first.text, page_url, 1, site, archive)]
+            _require(results[0], 1)
+
+        known = listing.max_pages
+        last = min(known, max_pages) if known and max_pages else known
+
+        def load(page):
+            with trace_page(site, f"{page_url}#page={page}"):
+                html = fetch_page(fetcher, listing, page)
+                return _parse_page(parse, html, page_url, page, site, archive)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            if last:
+                for page, result in enumerate(pool.map(load, range(2, last + 1)), start=2):
+                    _require(result, page)
+                    results.append(result)
+                return results
+            # page count unknown: batches of `workers` pages (up to max_pages) until one comes back empty
+            page = 2
+            while not max_pages or page <= max_pages:
+                stop = page + workers if not max_pages else min(page + workers, max_pages + 1)
+                batch = list(pool.map(load, range(page, stop)))
+                filled = [n for n, result in enumerate(batch, start=page) if result]
+                if page == 2:
+                    _require(batch[0], 2)
+                end = next((n for n, result in enumerate(batch, start=page) if not result), None)
+                if end is not None and filled and filled[-1] > end:
+                    raise ValueError(f"listing page {end} parsed to nothing but page {filled[-1]} did not")
+                results.extend(result for result in batch if result)
+                if end is not None:
+                    break
+                page = stop
+            return results
+    finally:
+        if own_fetcher:
+            fetcher.close()
+
+
+def _require(result, page):
+    if not result:
+        raise ValueError(f"listing page {page} parsed to nothing")
+
+
+def _parse_page(parse, html, page_url, page, site, archive):
+    if archive:
+        archive_page(f"{page_url}#page={page}", html, site=site)
+    with timed("extract.listing"):
+        return parse(html)
@@ -1,5 +1,4 @@
 import time
-import pandas as pd
 from tqdm import tqdm
 
 from selenium import webdriver
@@ -8,148 +7,187 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 
+from browser_pool import launch_browser, quit_browser
+from html_archive import archive_page
+from instrumentation import field_laps, page_failed, print_summary, timed, trace_page
+from rate_limit import polite_get
+from row_sink import RowSink
 
-driver = webdriver.Chrome()
+ROWS_FILE = "medscape_neurology_activities.jsonl"
+OUTPUT_FILE = "medscape_neurology_activities.xlsx"
 
 url = "https://www.medscape.org/neurology"
-driver.get(url)
 
-# Click "View More Activities" until no more
-while True:
-    try:
-        more_button = WebDriverWait(driver, 5).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, ".view-more.view-all-main-content"))
-        )
-        driver.execute_script("arguments[0].click();", more_button)
-        time.sleep(1)  # Reduced sleep
-    except:
-        break
-
-# Find all activity cards
-cards = driver.find_elements(By.CSS_SELECTOR, ".hp-card_main")
-
-# Extract links
-links = []
-for card in cards:
-    try:
-        title_a = card.find_element(By.CSS_SELECTOR, ".title")
-        link = title_a.get_attribute("href")
-        links.append(link)
-    except:
-        pass
-
-print(f"Total activities found: {len(links)}")
-
-data = []
-
-for link in tqdm(links, desc="Processing activities"):
-    driver.get(link)
-
-    try:
-        WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "h1.title"))
-        )
-    except:
-        continue
 
+# ---------- Activity page ----------
+# "js":  read every field in one execute_script round trip
+#        (falls back to the per-field lookups if the script fails)
+# "dom": one WebDriver find_element per field
+EXTRACT_MODE = "js"
+
+# Field groups of an activity page: (column, locator strategy, locator, label removed from the text)
+FIELD_GROUPS = [
+    ("title", [
+        ("Title", By.CSS_SELECTOR, "h1.title", None),
+    ]),
+    ("credits", [
+        ("Physicians credits", By.XPATH,
+         "//p[normalize-space(.)='Physicians']/following-sibling::span/parent::div", "Physicians"),
+        ("Nurses Credits", By.XPATH,
+         "//p[normalize-space(.)='Nurses']/following-sibling::span/parent::div/parent::div", "Nurses"),
+        ("Pharmacists credits", By.XPATH,
+         "//p[normalize-space(.)='Pharmacists']/following-sibling::span/parent::div/parent::div", "Pharmacists"),
+        ("Physician Assistants credits", By.XPATH,
+         "//p[normalize-space(.)='Physician Assistants']/following-sibling::span/parent::div/parent::div",
+         "Physician Assistants"),
+        ("ABIM Diplomates credits", By.XPATH,
+         "//p[normalize-space(.)='ABIM Diplomates']/following-sibling::span/parent::div/parent::div",
+         "ABIM Diplomates"),
+        ("IPCE credits", By.XPATH, "//p[strong[normalize-space(.)='IPCE']]", "IPCE"),
+    ]),
+    ("dates", [
+        ("CME / ABIM MOC / CE Released Date", By.CSS_SELECTOR, ".cme-released-date",
+         "CME / ABIM MOC / CE Released:"),
+        ("Valid for credit through", By.CSS_SELECTOR, ".valid-credit-through", "Valid for credit through:"),
+    ]),
+    ("sections", [
+        ("Target Audience and Goal Statement", By.CSS_SELECTOR, ".adp-infolayer-targetaudience",
+         "Target Audience and Goal Statement"),
+        ("Disclosures", By.CSS_SELECTOR, ".adp-infolayer-disclosures", "Disclosures"),
+        ("Author", By.CSS_SELECTOR, ".adp-infolayer-contributers", None),
+        ("Instructions for Participation & Credit", By.CSS_SELECTOR, ".instructions",
+         "Instructions for Participation & Credit"),
+    ]),
+]
+FIELDS = [field for _, fields in FIELD_GROUPS for field in fields]
+
+# {column: rendered text, or null when the element is missing} for every field at once.
+# innerText only: like WebElement.text it is empty for hidden or collapsed elements
+_EXTRACT_JS = """
+var fields = arguments[0], out = {};
+for (var i = 0; i < fields.length; i++) {
+    var f = fields[i], el = null;
+    try {
+        el = f[1] === 'xpath'
+            ? document.evaluate(f[2], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+            : document.querySelector(f[2]);
+    } catch (e) {}
+    out[f[0]] = el ? (el.innerText || '') : null;
+}
+return out;
+"""
+
+
+def _field_value(text, label):
+    text = (text or "").strip()
+    return text.replace(label, "").strip() if label else text
+
+
+def _rendered_text(text):
+    # innerText keeps runs of spaces and non-breaking spaces that WebElement.text collapses
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(lines)
+
+
+def extract_activity_js(driver, link):
+    """Row for the loaded activity page from a single execute_script; None if the script fails."""
+    try:
+        values = driver.execute_script(_EXTRACT_JS, [[col, by, loc] for col, by, loc, _ in FIELDS])
+    except Exception:
+        return None
+    if not isinstance(values, dict):
+        return None
     row = {"Activity URL": link}
+    for column, _, _, label in FIELDS:
+        text = values.get(column)
+        row[column] = _field_value(_rendered_text(text), label) if text else ""
+    return row
 
-    # Extract Title
-    try:
-        row["Title"] = driver.find_element(By.CSS_SELECTOR, "h1.title").text.strip()
-    except:
-        row["Title"] = ""
-
-    # Extract Physicians credits
-    try:
-        phys_div = driver.find_element(By.XPATH, "//p[normalize-space(.)='Physicians']/following-sibling::span/parent::div")
-        row["Physicians credits"] = phys_div.text.strip().replace('Physicians', '').strip()
-    except:
-        row["Physicians credits"] = ""
-
-    # Extract Nurses Credits
-    try:
-        nurse_div = driver.find_element(By.XPATH, "//p[normalize-space(.)='Nurses']/following-sibling::span/parent::div/parent::div")
-        row["Nurses Credits"] = nurse_div.text.strip().replace('Nurses', '').strip()
-    except:
-        row["Nurses Credits"] = ""
-
-    # Extract Pharmacists credits
-    try:
-        pharm_div = driver.find_element(By.XPATH, "//p[normalize-space(.)='Pharmacists']/following-sibling::span/parent::div/parent::div")
-        row["Pharmacists credits"] = pharm_div.text.strip().replace('Pharmacists', '').strip()
-    except:
-        row["Pharmacists credits"] = ""
-
-    # Extract physicians assistants credits
-    try:
-        pa_div = driver.find_element(By.XPATH, "//p[normalize-space(.)='Physician Assistants']/following-sibling::span/parent::div/parent::div")
-        row["Physician Assistants credits"] = pa_div.text.strip().replace('Physician Assistants', '').strip()
-    except:
-        row["Physician Assistants credits"] = ""
-
-    # Extract ABIM diplomates credits
-    try:
-        abim_div = driver.find_element(By.XPATH, "//p[normalize-space(.)='ABIM Diplomates']/following-sibling::span/parent::div/parent::div")
-        row["ABIM Diplomates credits"] = abim_div.text.strip().replace('ABIM Diplomates', '').strip()
-    except:
-        row["ABIM Diplomates credits"] = ""
-
-    # Extract IPCE credits
-    try:
-        ipce_div = driver.find_element(By.XPATH, "//p[strong[normalize-space(.)='IPCE']]")
-        row["IPCE credits"] = ipce_div.text.strip().replace('IPCE', '').strip()
-    except:
-        row["IPCE credits"] = ""
-
-    # Extract CME / ABIM MOC / CE Released Date
-    try:
-        released = driver.find_element(By.CSS_SELECTOR, ".cme-released-date")
-        row["CME / ABIM MOC / CE Released Date"] = released.text.strip().replace('CME / ABIM MOC / CE Released:', '').strip()
-    except:
-        row["CME / ABIM MOC / CE Released Date"] = ""
-
-    # Extract Valid for credit through
-    try:
-        valid = driver.find_element(By.CSS_SELECTOR, ".valid-credit-through")
-        row["Valid for credit through"] = valid.text.strip().replace('Valid for credit through:', '').strip()
-    except:
-        row["Valid for credit through"] = ""
-
-    # Extract Target Audience and Goal Statement
-    try:
-        target = driver.find_element(By.CSS_SELECTOR, ".adp-infolayer-targetaudience")
-        row["Target Audience and Goal Statement"] = target.text.strip().replace('Target Audience and Goal Statement', '').strip()
-    except:
-        row["Target Audience and Goal Statement"] = ""
-
-    # Extract Disclosures
-    try:
-        disc = driver.find_element(By.CSS_SELECTOR, ".adp-infolayer-disclosures")
-        row["Disclosures"] = disc.text.strip().replace('Disclosures', '').strip()
-    except:
-        row["Disclosures"] = ""
-
-    # Extract Author
-    try:
-        author_section = driver.find_element(By.CSS_SELECTOR, ".adp-infolayer-contributers")
-        row["Author"] = author_section.text.strip()
-    except:
-        row["Author"] = ""
-
-    # Extract Instructions for Participation & Credit
-    try:
-        instr = driver.find_element(By.CSS_SELECTOR, ".instructions")
-        row["Instructions for Participation & Credit"] = instr.text.strip().replace('Instructions for Participation & Credit', '').strip()
-    except:
-        row["Instructions for Participation & Credit"] = ""
 
-    data.append(row)
-
-    # Save incrementally
-    df = pd.DataFrame(data)
-    df.to_excel("medscape_neurology_activities.xlsx", index=False)
-
-driver.quit()
-
-print("Scraping completed. Data saved to medscape_neurology_activities.xlsx")
\ No newline at end of file
+def extract_activity_dom(driver, link):
+    """Row for the loaded activity page, one WebDriver lookup per field."""
+    lap = field_laps()
+    row = {"Activity URL": link}
+    for group, fields in FIELD_GROUPS:
+        for column, by, locator, label in fields:
+            try:
+                row[column] = _field_value(driver.find_element(by, locator).text, label)
+            except Exception:
+                row[column] = ""
+        lap(group)
+    return row
+
+
+def extract_activity(driver, link):
+    """Row for the activity page currently loaded in driver."""
+    if EXTRACT_MODE == "js":
+        with timed("extract.script"):
+            row = extract_activity_js(driver, link)
+        if row is not None:
+            return row
+    return extract_activity_dom(driver, link)
+
+
+# ---------- Main ----------
+def main():
+    driver = launch_browser(webdriver.Chrome)
+    polite_get(driver, url)
+
+    # Click "View More Activities" until no more
+    while True:
+        try:
+            more_button = WebDriverWait(driver, 5).until(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, ".view-more.view-all-main-content"))
+            )
+            driver.execute_script("arguments[0].click();", more_button)
+            time.sleep(1)  # Reduced sleep
+        except:
+            break
+
+    # Find all activity cards
+    cards = driver.find_elements(By.CSS_SELECTOR, ".hp-card_main")
+
+    # Extract links
+    links = []
+    for card in cards:
+        try:
+            title_a = card.find_element(By.CSS_SELECTOR, ".title")
+            link = title_a.get_attribute("href")
+            links.append(link)
+        except:
+            pass
+
+    print(f"Total activities found: {len(links)}")
+
+    # Checkpoint rows in batches; the workbook is written once at the end.
+    sink = RowSink(ROWS_FILE, flush_rows=25, flush_seconds=30)
+
+    for link in tqdm(links, desc="Processing activities"):
+        with trace_page("medscape", link):
+            polite_get(driver, link)
+
+            with timed("wait"):
+                try:
+                    WebDriverWait(driver, 5).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, "h1.title"))
+                    )
+                except:
+                    page_failed("h1.title did not appear")
+                    continue
+
+            archive_page(link, driver.page_source, site="medscape")
+
+            row = extract_activity(driver, link)
+        sink.write(row)
+
+    sink.close()
+    quit_browser(driver)
+    print_summary("medscape")
+
+    sink.export_excel(OUTPUT_FILE)
+
+    print(f"Scraping completed. Data saved to {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
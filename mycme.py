@@ -12,11 +12,26 @@ from bs4 import BeautifulSoup, NavigableString
 from fake_useragent import UserAgent
 import undetected_chromedriver as uc
 
+from activity_ids import activity_id, register_discovered
+from browser_pool import DriverPool
+from html_archive import archive_page
+from instrumentation import print_summary, timed, trace_page
+from rate_limit import polite_get
+from readiness import for_site
+from url_registry import UrlRegistry
+
 # Co
 BASE_URL = "https://www.mycme.com"
 SEARCH_URL_PATTERN = ""
 OUTPUT_FILE = "mycme_data.csv"
 PAGES_TO_SCRAPE = 16  # change this if you don't want all 16 pages
+CHROME_DRIVER_PATH = os.environ.get("CHROME_DRIVER_PATH")
+POOL_SIZE = 1  # number of long-lived browser sessions
+RECYCLE_AFTER = 40  # restart a session after this many courses
+# a course page is ready once its title is rendered and the Ember app has gone quiet
+COURSE_READY = for_site("mycme", selectors=("h1",), network_idle=0.5, dom_quiet=0.5, max_wait=8)
+# nothing marks the lazy sections before they arrive, so the wait after scrolling keeps a floor
+LAZY_LOAD_MIN_WAIT = 1.5
 
 # Added "Course Details" and "Agenda" columns before "Content Type"
 COLUMNS = [
@@ -52,16 +67,15 @@ def setup_driver():
     driver.implicitly_wait(5)
     return driver
 
-def load_all_course_links():
+def load_all_course_links(pool):
     print(f"🔍 Loading myCME course catalog across {PAGES_TO_SCRAPE} pages...")
-    course_links = set()
-    driver = setup_driver()
-    try:
+    course_links = UrlRegistry(key=activity_id)
+    with pool.lease() as driver:
         # pages are 1..PAGES_TO_SCRAPE inclusive
         for page in range(1, PAGES_TO_SCRAPE + 1):
             page_url = SEARCH_URL_PATTERN.format(page=page)
             print(f"🔄 Loading page: {page_url}")
-            driver.get(page_url)
+            polite_get(driver, page_url)
             time.sleep(3)  # allow page to load (adjust if needed)
             soup = BeautifulSoup(driver.page_source, "html.parser")
             course_tags = soup.find_all("a", class_="ember-view catalog-item")
@@ -70,14 +84,9 @@ def load_all_course_links():
                 if href:
                     full_link = BASE_URL + href if href.startswith("/") else href
                     course_links.add(full_link)
-    finally:
-        try:
-            driver.quit()
-        except Exception:
-            pass
 
     print(f"✅ Found {len(course_links)} course links across {PAGES_TO_SCRAPE} pages.")
-    return list(course_links)
+    return course_links.urls()
 
 def extract_program_description(soup):
     program_description = ""
@@ -214,6 +223,95 @@ def extract_affiliation(element):
                         affiliation_parts.append(text)
     return ", ".join(affiliation_parts) if affiliation_parts else ""
 
+def _faculty_from_strong_tags(p):
+    details = []
+    strong_tags = p.find_all("strong")
+    if not strong_tags:
+        return details
+    for i, strong in enumerate(strong_tags):
+        text = strong.get_text(" ", strip=True)
+        if not text or "," not in text:
+            continue
+        parts = text.split(",")
+        faculty_name = parts[0].strip() if parts else ""
+        degree = ""
+        if len(parts) > 1:
+            degree = ", ".join(part.strip() for part in parts[1:])
+        affiliation_parts = []
+        next_strong = strong_tags[i + 1] if i + 1 < len(strong_tags) else None
+        for sibling in strong.next_siblings:
+            if sibling == next_strong:
+                break
+            if isinstance(sibling, NavigableString):
+                txt = sibling.strip()
+                if txt:
+                    affiliation_parts.append(txt)
+            elif sibling.name == "br":
+                continue
+            else:
+                txt = sibling.get_text(" ", strip=True)
+                if txt:
+                    affiliation_parts.append(txt)
+        affiliation = ", ".join(affiliation_parts)
+        details.append({
+            "Faculty Name": faculty_name,
+            "Degree": degree,
+            "Affiliation": affiliation,
+            "Faculty Bio": ""
+        })
+    return details
+
+def extract_faculty_from_tab(soup):
+    """Faculty listed on the opened faculty tab: PDF bio links, or bold "Name, Degree" entries."""
+    faculty_details = []
+    pdf_faculty = soup.find_all("a", href=lambda x: x and ".pdf" in x)
+    if pdf_faculty:
+        for a in pdf_faculty:
+            pdf_link = a.get("href")
+            if pdf_link and pdf_link.startswith("/"):
+                pdf_link = BASE_URL + pdf_link
+            text = a.get_text(" ", strip=True)
+            if "(" in text:
+                text = text.split("(")[0].strip()
+            parts = text.split(",")
+            faculty_name = parts[0].strip() if parts else ""
+            degree = ""
+            if len(parts) > 1:
+                degree = ", ".join(part.strip() for part in parts[1:])
+            affiliation = extract_affiliation(a)
+            faculty_details.append({
+                "Faculty Name": faculty_name,
+                "Degree": degree,
+                "Affiliation": affiliation,
+                "Faculty Bio": pdf_link
+            })
+    else:
+        p_faculty = soup.find_all("p")
+        for p in p_faculty:
+            if p.get("class") and "detailsTitle" in p.get("class"):
+                continue
+            details = _faculty_from_strong_tags(p)
+            faculty_details.extend(details)
+    return faculty_details
+
+def extract_faculty_from_editor_content(soup):
+    """Fallback: bold "Name, Degree" entries inside the course's editor-content block."""
+    faculty_details = []
+    editor_div = soup.find("div", {"id": "ember2101", "class": "ember-view editor-content indent-list"})
+    if not editor_div:
+        editor_div = soup.find("div", class_="editor-content")
+    if editor_div:
+        print("Using alternative extraction from editor-content div for faculty details.")
+        p_tags = editor_div.find_all("p")
+        for p in p_tags:
+            if p.get("class") and "detailsTitle" in p.get("class"):
+                continue
+            if p.find("img"):
+                continue
+            details = _faculty_from_strong_tags(p)
+            faculty_details.extend(details)
+    return faculty_details
+
 def extract_faculty_details(driver):
     faculty_details = []
     faculty_button = None
@@ -244,134 +342,17 @@ def extract_faculty_details(driver):
                 driver.execute_script("arguments[0].click();", faculty_button)
         time.sleep(3)
         soup = BeautifulSoup(driver.page_source, "html.parser")
-        pdf_faculty = soup.find_all("a", href=lambda x: x and ".pdf" in x)
-        if pdf_faculty:
-            for a in pdf_faculty:
-                pdf_link = a.get("href")
-                if pdf_link and pdf_link.startswith("/"):
-                    pdf_link = BASE_URL + pdf_link
-                text = a.get_text(" ", strip=True)
-                if "(" in text:
-                    text = text.split("(")[0].strip()
-                parts = text.split(",")
-                faculty_name = parts[0].strip() if parts else ""
-                degree = ""
-                if len(parts) > 1:
-                    degree = ", ".join(part.strip() for part in parts[1:])
-                affiliation = extract_affiliation(a)
-                faculty_details.append({
-                    "Faculty Name": faculty_name,
-                    "Degree": degree,
-                    "Affiliation": affiliation,
-                    "Faculty Bio": pdf_link
-                })
-        else:
-            def extract_faculty_details_from_p(p):
-                details = []
-                strong_tags = p.find_all("strong")
-                if not strong_tags:
-                    return details
-                for i, strong in enumerate(strong_tags):
-                    text = strong.get_text(" ", strip=True)
-                    if not text or "," not in text:
-                        continue
-                    parts = text.split(",")
-                    faculty_name = parts[0].strip() if parts else ""
-                    degree = ""
-                    if len(parts) > 1:
-                        degree = ", ".join(part.strip() for part in parts[1:])
-                    affiliation_parts = []
-                    next_strong = strong_tags[i + 1] if i + 1 < len(strong_tags) else None
-                    for sibling in strong.next_siblings:
-                        if sibling == next_strong:
-                            break
-                        if isinstance(sibling, NavigableString):
-                            txt = sibling.strip()
-                            if txt:
-                                affiliation_parts.append(txt)
-                        elif sibling.name == "br":
-                            continue
-                        else:
-                            txt = sibling.get_text(" ", strip=True)
-                            if txt:
-                                affiliation_parts.append(txt)
-                    affiliation = ", ".join(affiliation_parts)
-                    details.append({
-                        "Faculty Name": faculty_name,
-                        "Degree": degree,
-                        "Affiliation": affiliation,
-                        "Faculty Bio": ""
-                    })
-                return details
-
-            p_faculty = soup.find_all("p")
-            for p in p_faculty:
-                if p.get("class") and "detailsTitle" in p.get("class"):
-                    continue
-                details = extract_faculty_details_from_p(p)
-                faculty_details.extend(details)
+        faculty_details = extract_faculty_from_tab(soup)
 
     if not faculty_details:
         soup = BeautifulSoup(driver.page_source, "html.parser")
-        editor_div = soup.find("div", {"id": "ember2101", "class": "ember-view editor-content indent-list"})
-        if not editor_div:
-            editor_div = soup.find("div", class_="editor-content")
-        if editor_div:
-            print("Using alternative extraction from editor-content div for faculty details.")
-            p_tags = editor_div.find_all("p")
-            def extract_faculty_details_from_p(p):
-                details = []
-                strong_tags = p.find_all("strong")
-                if not strong_tags:
-                    return details
-                for i, strong in enumerate(strong_tags):
-                    text = strong.get_text(" ", strip=True)
-                    if not text or "," not in text:
-                        continue
-                    parts = text.split(",")
-                    faculty_name = parts[0].strip() if parts else ""
-                    degree = ""
-                    if len(parts) > 1:
-                        degree = ", ".join(part.strip() for part in parts[1:])
-                    affiliation_parts = []
-                    next_strong = strong_tags[i + 1] if i + 1 < len(strong_tags) else None
-                    for sibling in strong.next_siblings:
-                        if sibling == next_strong:
-                            break
-                        if isinstance(sibling, NavigableString):
-                            txt = sibling.strip()
-                            if txt:
-                                affiliation_parts.append(txt)
-                        elif sibling.name == "br":
-                            continue
-                        else:
-                            txt = sibling.get_text(" ", strip=True)
-                            if txt:
-                                affiliation_parts.append(txt)
-                    affiliation = ", ".join(affiliation_parts)
-                    details.append({
-                        "Faculty Name": faculty_name,
-                        "Degree": degree,
-                        "Affiliation": affiliation,
-                        "Faculty Bio": ""
-                    })
-                return details
-
-            for p in p_tags:
-                if p.get("class") and "detailsTitle" in p.get("class"):
-                    continue
-                if p.find("img"):
-                    continue
-                details = extract_faculty_details_from_p(p)
-                faculty_details.extend(details)
+        faculty_details = extract_faculty_from_editor_content(soup)
     if not faculty_details:
         print("No faculty details found after all extraction methods.")
     return faculty_details
 
-def scrape_course_details(course_url):
-    driver = setup_driver()
-    course_rows = []
-    course_data = {
+def _empty_course_data(course_url):
+    return {
         "Course Title": "",
         "Course Details": "",
         "Agenda": "",
@@ -379,91 +360,89 @@ def scrape_course_details(course_url):
         "Program Description": "",
         "Source Link": course_url
     }
-    try:
-        driver.get(course_url)
-        time.sleep(5)
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(3)
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        course_data["Course Title"] = extract_title(soup)
-        course_data["Course Details"] = extract_course_details(soup)
-        course_data["Agenda"] = extract_agenda(soup)
-        course_data["Content Type"] = extract_content_type(soup)
-        course_data["Program Description"] = extract_program_description(soup)
-        faculty_details = extract_faculty_details(driver)
 
-        if faculty_details:
-            separator = " || "
-            faculty_names = separator.join([f.get("Faculty Name", "") for f in faculty_details])
-            degrees = separator.join([f.get("Degree", "") for f in faculty_details])
-            affiliations = separator.join([f.get("Affiliation", "") for f in faculty_details])
-            bios_list = [f.get("Faculty Bio", "").strip() for f in faculty_details if f.get("Faculty Bio", "").strip()]
-            faculty_bios = separator.join(bios_list) if bios_list else ""
+def extract_course_sections(course_data, soup):
+    course_data["Course Title"] = extract_title(soup)
+    course_data["Course Details"] = extract_course_details(soup)
+    course_data["Agenda"] = extract_agenda(soup)
+    course_data["Content Type"] = extract_content_type(soup)
+    course_data["Program Description"] = extract_program_description(soup)
+
+def build_course_row(course_data, faculty_details):
+    """One output row per course; multiple faculty are joined with " || "."""
+    if faculty_details:
+        separator = " || "
+        faculty_names = separator.join([f.get("Faculty Name", "") for f in faculty_details])
+        degrees = separator.join([f.get("Degree", "") for f in faculty_details])
+        affiliations = separator.join([f.get("Affiliation", "") for f in faculty_details])
+        bios_list = [f.get("Faculty Bio", "").strip() for f in faculty_details if f.get("Faculty Bio", "").strip()]
+        faculty_bios = separator.join(bios_list) if bios_list else ""
+    else:
+        faculty_names = degrees = affiliations = faculty_bios = ""
 
-            row = {
-                "Faculty Name": faculty_names,
-                "Degree": degrees,
-                "Affiliation": affiliations,
-                "Faculty Bio": faculty_bios,
-                "Course Title": course_data["Course Title"],
-                "Course Details": course_data["Course Details"],
-                "Agenda": course_data["Agenda"],
-                "Content Type": course_data["Content Type"],
-                "Program Description": course_data["Program Description"],
-                "Source Link": course_data["Source Link"]
-            }
-            course_rows.append(row)
-        else:
-            row = {
-                "Faculty Name": "",
-                "Degree": "",
-                "Affiliation": "",
-                "Faculty Bio": "",
-                "Course Title": course_data["Course Title"],
-                "Course Details": course_data["Course Details"],
-                "Agenda": course_data["Agenda"],
-                "Content Type": course_data["Content Type"],
-                "Program Description": course_data["Program Description"],
-                "Source Link": course_data["Source Link"]
-            }
-            course_rows.append(row)
+    return {
+        "Faculty Name": faculty_names,
+        "Degree": degrees,
+        "Affiliation": affiliations,
+        "Faculty Bio": faculty_bios,
+        "Course Title": course_data.get("Course Title", ""),
+        "Course Details": course_data.get("Course Details", ""),
+        "Agenda": course_data.get("Agenda", ""),
+        "Content Type": course_data.get("Content Type", ""),
+        "Program Description": course_data.get("Program Description", ""),
+        "Source Link": course_data.get("Source Link", "")
+    }
+
+def scrape_course_details(course_url, pool):
+    course_data = _empty_course_data(course_url)
+    try:
+        with pool.lease() as driver:
+            polite_get(driver, course_url)
+            COURSE_READY.wait(driver)
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            # lazy sections load on scroll; give them time to start, then wait for the DOM and network to settle
+            COURSE_READY.wait(driver, selectors=(), min_wait=LAZY_LOAD_MIN_WAIT)
+            with timed("extract.sections"):
+                soup = BeautifulSoup(driver.page_source, "html.parser")
+                extract_course_sections(course_data, soup)
+            with timed("extract.faculty"):
+                faculty_details = extract_faculty_details(driver)
+            # archived after the faculty tab is opened, so the snapshot holds every section
+            archive_page(course_url, driver.page_source, site="mycme")
+        return [build_course_row(course_data, faculty_details)]
     except Exception as e:
         print(f"❌ Error scraping {course_url}: {e}")
-        row = {
-            "Faculty Name": "",
-            "Degree": "",
-            "Affiliation": "",
-            "Faculty Bio": "",
-            "Course Title": course_data.get("Course Title", ""),
-            "Course Details": course_data.get("Course Details", ""),
-            "Agenda": course_data.get("Agenda", ""),
-            "Content Type": course_data.get("Content Type", ""),
-            "Program Description": course_data.get("Program Description", ""),
-            "Source Link": course_data.get("Source Link", course_url)
-        }
-        course_rows.append(row)
-    finally:
-        try:
-            driver.quit()
-        except Exception:
-            pass
-    return course_rows
+        return [build_course_row(course_data, [])]
+
+def parse_course_html(course_url, html):
+    """Rows for an already fetched course page (e.g. an archived snapshot taken on the faculty tab)."""
+    soup = BeautifulSoup(html, "html.parser")
+    course_data = _empty_course_data(course_url)
+    extract_course_sections(course_data, soup)
+    faculty_details = extract_faculty_from_tab(BeautifulSoup(html, "html.parser"))
+    if not faculty_details:
+        faculty_details = extract_faculty_from_editor_content(soup)
+    return [build_course_row(course_data, faculty_details)]
 
 def main():
     if os.path.exists(OUTPUT_FILE):
         os.remove(OUTPUT_FILE)
-    course_links = load_all_course_links()
-    if not course_links:
-        print("❌ No course links found. Exiting.")
-        return
-    for course_url in tqdm(course_links, desc="Scraping Courses"):
-        course_rows = scrape_course_details(course_url)
-        df = pd.DataFrame(course_rows, columns=COLUMNS)
-        if not os.path.exists(OUTPUT_FILE):
-            df.to_csv(OUTPUT_FILE, mode='w', index=False)
-        else:
-            df.to_csv(OUTPUT_FILE, mode='a', header=False, index=False)
-        print(f"✅ Saved data for {course_url}")
+    with DriverPool(setup_driver, size=POOL_SIZE, recycle_after=RECYCLE_AFTER) as pool:
+        course_links = load_all_course_links(pool)
+        if not course_links:
+            print("❌ No course links found. Exiting.")
+            return
+        register_discovered(course_links, "myCME")
+        for course_url in tqdm(course_links, desc="Scraping Courses"):
+            with trace_page("mycme", course_url):
+                course_rows = scrape_course_details(course_url, pool)
+                df = pd.DataFrame(course_rows, columns=COLUMNS)
+                if not os.path.exists(OUTPUT_FILE):
+                    df.to_csv(OUTPUT_FILE, mode='w', index=False)
+                else:
+                    df.to_csv(OUTPUT_FILE, mode='a', header=False, index=False)
+                print(f"✅ Saved data for {course_url}")
+    print_summary("mycme")
     print(f"✅ Data scraping completed and saved to '{OUTPUT_FILE}' successfully!")
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from tqdm import tqdm
 from selenium import webdriver
@@ -12,9 +13,102 @@ from selenium.webdriver.chrome.service import Service as ChromeService
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 
+from activity_ids import activity_id, register_discovered
+from browser_pool import launch_browser, quit_browser
+from fetch import Fetcher, browser_loader
+from html_archive import archive_page, default_archive
+from instrumentation import field_laps, print_summary, timed, trace_page
+from profile_cache import ProfileCache
+from rate_limit import polite_get, polite_open_window
+from url_registry import UrlRegistry
+
 START_URL = "https://www.pri-med.com/online-cme-ce"
 BASE = "https://www.pri-med.com"
 
+# Faculty profiles are fetched over HTTP, PROFILE_WORKERS at a time, and cached by
+# profile URL across courses and runs.
+PROFILE_WORKERS = 6
+PROFILE_CACHE_DB = "primed_faculty_profiles.sqlite"
+PROFILE_MAX_AGE_DAYS = 30
+
+fetcher = Fetcher(per_host=PROFILE_WORKERS, archive=default_archive(), site="primed")
+_profile_cache = None
+
+def profile_cache():
+    global _profile_cache
+    if _profile_cache is None:
+        _profile_cache = ProfileCache(PROFILE_CACHE_DB, max_age_days=PROFILE_MAX_AGE_DAYS)
+    return _profile_cache
+
+def course_page_ready(html):
+    # course pages are server-rendered; anything without the intro block needs the browser
+    return "course-detail__intro__title" in html
+
+def parse_faculty_profile(html):
+    prof_soup = BeautifulSoup(html, "html.parser")
+    bio = prof_soup.select_one("p#collapsable-bio") or prof_soup.select_one(".bio__text, .bio")
+    return {
+        "faculty_qualification": safe_text(prof_soup.select_one("h3.subtitle")),
+        "faculty_affiliation": safe_text(prof_soup.select_one("ul.affiliation__list li")),
+        "faculty_bio": safe_text(bio),
+    }
+
+def has_profile(profile):
+    # shells, bot walls and error pages parse to all-empty fields
+    return profile is not None and any(profile.values())
+
+def fetch_profile_http(prof):
+    """Parsed profile over HTTP, or None when the page needs the browser."""
+    try:
+        page = fetcher.get(prof)
+    except Exception:
+        return None
+    if page.status != 200:
+        return None
+    profile = parse_faculty_profile(page.text)
+    return profile if has_profile(profile) else None
+
+def fetch_profile_in_window(driver, prof):
+    main_window = driver.current_window_handle
+    try:
+        polite_open_window(driver, prof)
+        WebDriverWait(driver, 10).until(lambda d: len(d.window_handles) > 1)
+        new_handles = [h for h in driver.window_handles if h != main_window]
+        driver.switch_to.window(new_handles[-1])
+        time.sleep(1)
+        prof_html = driver.page_source
+        archive_page(prof, prof_html, site="primed")
+        return parse_faculty_profile(prof_html)
+    except:
+        return None
+    finally:
+        try:
+            driver.close()
+        except:
+            pass
+        driver.switch_to.window(main_window)
+        time.sleep(0.2)
+
+def fetch_faculty_profiles(driver, profile_urls):
+    """
+    {profile_url: profile} for every URL: cached profiles first, the rest
+    fetched concurrently over HTTP, and only pages HTTP could not serve
+    opened in a browser window.
+    """
+    cache = profile_cache()
+    profiles = cache.get_many(profile_urls)
+    missing = [u for u in dict.fromkeys(profile_urls) if u not in profiles]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(PROFILE_WORKERS, len(missing))) as pool:
+            fetched = dict(zip(missing, pool.map(fetch_profile_http, missing)))
+        for prof in missing:
+            profile = fetched[prof] or fetch_profile_in_window(driver, prof)
+            if profile is not None:
+                profiles[prof] = profile
+                if has_profile(profile):  # an empty one is retried on the next course or run
+                    cache.put(prof, profile)
+    return profiles
+
 def setup_driver(headless=True):
     options = webdriver.ChromeOptions()
     if headless:
@@ -62,9 +156,10 @@ def click_next_page(driver):
         return False
 
 def extract_course_details(driver, course_url):
-    driver.get(course_url)
-    time.sleep(1)
-    soup = BeautifulSoup(driver.page_source, "html.parser")
+    page = fetcher.fetch(course_url, is_ready=course_page_ready,
+                         browser_fallback=browser_loader(driver, settle=1))
+    lap = field_laps()
+    soup = BeautifulSoup(page.text, "html.parser")
 
     title = safe_text(soup.select_one(".course-detail__intro__title h1"))
     course_type = safe_text(soup.select_one(".course-detail__intro__title p.type"))
@@ -102,6 +197,8 @@ def extract_course_details(driver, course_url):
             topics = ";".join(lis)
             break
 
+    lap("course")
+
     faculty_items = []
     faculty_blocks = soup.select(".course-detail__faculty__item")
 
@@ -118,38 +215,15 @@ def extract_course_details(driver, course_url):
             "faculty_bio": ""
         })
 
-    main_window = driver.current_window_handle
-
-    for f in tqdm(faculty_items, desc="Faculty", leave=False):
-        prof = f.get("faculty_profile_url")
-        if not prof:
-            continue
-        try:
-            driver.execute_script("window.open(arguments[0]);", prof)
-            WebDriverWait(driver, 10).until(lambda d: len(d.window_handles) > 1)
-            new_handles = [h for h in driver.window_handles if h != main_window]
-            driver.switch_to.window(new_handles[-1])
-            time.sleep(1)
-            prof_soup = BeautifulSoup(driver.page_source, "html.parser")
-
-            q_tag = prof_soup.select_one("h3.subtitle")
-            f["faculty_qualification"] = safe_text(q_tag)
-
-            aff = prof_soup.select_one("ul.affiliation__list li")
-            f["faculty_affiliation"] = safe_text(aff)
-
-            bio = prof_soup.select_one("p#collapsable-bio") or prof_soup.select_one(".bio__text, .bio")
-            f["faculty_bio"] = safe_text(bio)
-
-        except:
-            pass
-        finally:
-            try:
-                driver.close()
-            except:
-                pass
-            driver.switch_to.window(main_window)
-            time.sleep(0.2)
+    lap("faculty")
+    # profiles come from the cache or from worker threads, so only their total time is traced
+    with timed("extract.faculty_profiles"):
+        profiles = fetch_faculty_profiles(driver, [f["faculty_profile_url"] for f in faculty_items
+                                                   if f.get("faculty_profile_url")])
+    for f in faculty_items:
+        profile = profiles.get(f.get("faculty_profile_url"))
+        if profile:
+            f.update(profile)
 
     course_info = {
         "title": title,
@@ -165,17 +239,14 @@ def extract_course_details(driver, course_url):
     return course_info, faculty_items
 
 def main(save_csv="courses_faculty.csv", save_xlsx="Primed_courses_faculty.xlsx", headless=True):
-    driver = setup_driver(headless=headless)
+    driver = launch_browser(lambda: setup_driver(headless=headless))
     try:
-        driver.get(START_URL)
+        polite_get(driver, START_URL)
         time.sleep(1)
-        all_course_links = []
+        discovered = UrlRegistry(key=activity_id)
 
         soup = BeautifulSoup(driver.page_source, "html.parser")
-        first_page_links = find_course_links_on_page(soup)
-        for l in first_page_links:
-            if l not in all_course_links:
-                all_course_links.append(l)
+        discovered.add_many(find_course_links_on_page(soup))
 
         for i in tqdm(range(57), desc="Next Pages"):
             try:
@@ -195,46 +266,48 @@ def main(save_csv="courses_faculty.csv", save_xlsx="Primed_courses_faculty.xlsx"
                     time.sleep(1)
                 time.sleep(0.6)
                 soup = BeautifulSoup(driver.page_source, "html.parser")
-                new_links = find_course_links_on_page(soup)
-                for l in new_links:
-                    if l not in all_course_links:
-                        all_course_links.append(l)
+                discovered.add_many(find_course_links_on_page(soup))
             except Exception:
                 continue
 
+        all_course_links = discovered.urls()
+        register_discovered(all_course_links, "Pri-Med")
+
         rows = []
 
         for c_link in tqdm(all_course_links, desc="Courses"):
-            course_info, faculty_items = extract_course_details(driver, c_link)
-            if not faculty_items:
-                rows.append({
-                    **course_info,
-                    "faculty_name": "",
-                    "faculty_qualification": "",
-                    "faculty_affiliation": "",
-                    "faculty_bio": "",
-                    "faculty_profile_url": ""
-                })
-            else:
-                for f in faculty_items:
+            with trace_page("primed", c_link):
+                course_info, faculty_items = extract_course_details(driver, c_link)
+                if not faculty_items:
                     rows.append({
                         **course_info,
-                        "faculty_name": f["faculty_name"],
-                        "faculty_qualification": f["faculty_qualification"],
-                        "faculty_affiliation": f["faculty_affiliation"],
-                        "faculty_bio": f["faculty_bio"],
-                        "faculty_profile_url": f["faculty_profile_url"]
+                        "faculty_name": "",
+                        "faculty_qualification": "",
+                        "faculty_affiliation": "",
+                        "faculty_bio": "",
+                        "faculty_profile_url": ""
                     })
-            time.sleep(0.4)
+                else:
+                    for f in faculty_items:
+                        rows.append({
+                            **course_info,
+                            "faculty_name": f["faculty_name"],
+                            "faculty_qualification": f["faculty_qualification"],
+                            "faculty_affiliation": f["faculty_affiliation"],
+                            "faculty_bio": f["faculty_bio"],
+                            "faculty_profile_url": f["faculty_profile_url"]
+                        })
+                time.sleep(0.4)
+        print_summary("primed")
 
         df = pd.DataFrame(rows)
         if not df.empty:
             df.to_csv(save_csv, index=False, encoding="utf-8-sig")
             df.to_excel(save_xlsx, index=False)
 
-        driver.quit()
+        quit_browser(driver)
     except:
-        driver.quit()
+        quit_browser(driver)
 
 if __name__ == "__main__":
     main(headless=False)
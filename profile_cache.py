@@ -0,0 +1,66 @@
+"""
+Persistent cache of parsed profile pages (faculty, speakers), keyed by URL.
+
+The same faculty members appear on many courses; a profile is fetched and
+parsed once and then served from SQLite for every later course and run:
+
+    cache = ProfileCache("primed_faculty_profiles.sqlite", max_age_days=30)
+    profile = cache.get(url)
+    if profile is None:
+        profile = parse(fetch(url))
+        cache.put(url, profile)
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+
+class ProfileCache:
+    def __init__(self, path, max_age_days=None):
+        self.path = path
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            " url TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url):
+        """The cached profile dict for url, or None if it is missing or older than max_age_days."""
+        with self._lock:
+            row = self._db.execute("SELECT data, fetched_at FROM profiles WHERE url = ?", (url,)).fetchone()
+            if row is None or (self.max_age and time.time() - row[1] > self.max_age):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def get_many(self, urls):
+        """{url: profile} for the urls that are cached."""
+        return {u: p for u, p in ((u, self.get(u)) for u in set(urls)) if p is not None}
+
+    def put(self, url, profile):
+        data = json.dumps(profile, ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO profiles (url, data, fetched_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(url) DO UPDATE SET data = excluded.data, fetched_at = excluded.fetched_at",
+                (url, data, time.time()),
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
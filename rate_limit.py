@@ -0,0 +1,231 @@
+"""
+Request rate limiting shared by concurrent scraper workers.
+
+A TokenBucket allows `rate` requests per second on average with bursts of up
+to `burst`; every worker calls acquire() before hitting the site, so adding
+workers raises throughput without raising the load on the server beyond the
+configured rate:
+
+    limiter = TokenBucket(rate=2.0, burst=4)
+    ...
+    limiter.acquire()
+    page = fetcher.get(url)
+
+HostScheduler applies this per host, together with a cap on requests in
+flight, and backs off when a host answers 429/503 or slows down (the rate is
+halved, then recovers step by step while responses are healthy). Every fetch
+path goes through the process-wide scheduler: Fetcher for HTTP, polite_get()
+for Selenium navigations and polite_open_window() for pages opened in a new
+window:
+
+    default_scheduler().configure("events.vindicocme.com", rate=3.0, max_in_flight=6)
+    polite_get(driver, url)
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from instrumentation import add_time, record_browser_bytes, timed
+
+DEFAULT_RATE = 2.0  # requests per second per host
+DEFAULT_BURST = 2
+DEFAULT_IN_FLIGHT = 4
+MIN_RATE = 0.05
+MAX_BACKOFF = 120.0
+LATENCY_WINDOW = 15  # recent response times the "slow" test compares against
+BACKOFF_STATUSES = (429, 503)
+# browser titles of throttling / overload pages (Selenium does not expose the status code)
+_THROTTLED_TITLES = ("429 too many", "too many requests", "503 service", "service unavailable", "rate limited")
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if they are available right now; never blocks."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available, then take them; returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class _HostState:
+    def __init__(self, rate, burst, max_in_flight):
+        self.target_rate = rate
+        self.bucket = TokenBucket(rate, burst)
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.max_in_flight = max_in_flight
+        self.cooldown_until = 0.0
+        self.strikes = 0
+        self.recent = deque(maxlen=LATENCY_WINDOW)  # every response time, slow ones included
+
+    @property
+    def latency(self):
+        """Median of the recent response times (None before the first one)."""
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[len(ordered) // 2]
+
+
+class HostScheduler:
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_in_flight=DEFAULT_IN_FLIGHT,
+                 slow_factor=3.0, slow_floor=2.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.slow_factor = slow_factor
+        self.slow_floor = slow_floor
+        self._hosts = {}
+        self._policies = {}
+        self._lock = threading.Lock()
+
+    def configure(self, host, rate=None, burst=None, max_in_flight=None):
+        """Set the budget of one host (before its first request)."""
+        with self._lock:
+            self._policies[host.lower()] = (rate or self.rate, burst or self.burst,
+                                            max_in_flight or self.max_in_flight)
+            self._hosts.pop(host.lower(), None)
+
+    def _state(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                rate, burst, in_flight = self._policies.get(host, (self.rate, self.burst, self.max_in_flight))
+                state = self._hosts[host] = _HostState(rate, burst, in_flight)
+        return state
+
+    @contextmanager
+    def slot(self, url):
+        """
+        Hold one of the host's in-flight slots for a request, after waiting out
+        any backoff and taking a token. Yields a callable to report the outcome:
+
+            with scheduler.slot(url) as done:
+                resp = session.get(url)
+                done(resp.status_code, retry_after=resp.headers.get("Retry-After"))
+        """
+        state = self._state(url)
+        queued = time.perf_counter()
+        with state.in_flight:
+            delay = state.cooldown_until - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            state.bucket.acquire()
+            add_time("throttle", time.perf_counter() - queued)
+            start = time.monotonic()
+            reported = []
+
+            def done(status=None, retry_after=None):
+                reported.append(True)
+                self._report(state, time.monotonic() - start, status, retry_after)
+
+            yield done
+            if not reported:
+                done()
+
+    def _report(self, state, elapsed, status, retry_after):
+        with self._lock:
+            if status in BACKOFF_STATUSES:
+                state.strikes += 1
+                pause = _retry_after_seconds(retry_after)
+                if pause is None:
+                    pause = min(MAX_BACKOFF, 2.0 ** state.strikes)
+                state.cooldown_until = max(state.cooldown_until, time.monotonic() + pause)
+                state.bucket.set_rate(max(MIN_RATE, state.bucket.rate / 2))
+                return
+            latency = state.latency
+            # slow responses count towards the median too: once a host is steadily slower (or a
+            # scraper moves to heavier pages) the median catches up and the rate recovers
+            state.recent.append(elapsed)
+            slow = latency is not None and elapsed > self.slow_floor and elapsed > self.slow_factor * latency
+            if slow:
+                state.bucket.set_rate(max(MIN_RATE, state.bucket.rate * 0.8))
+            else:
+                state.strikes = 0
+                if state.bucket.rate < state.target_rate:
+                    state.bucket.set_rate(min(state.target_rate, state.bucket.rate + 0.1 * state.target_rate))
+
+    def stats(self):
+        """{host: current rate} -- lower than configured while a host is being backed off."""
+        with self._lock:
+            return {host: round(state.bucket.rate, 3) for host, state in self._hosts.items()}
+
+
+def _retry_after_seconds(value):
+    if not value:
+        return None
+    try:
+        return min(MAX_BACKOFF, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return None  # HTTP-date form; fall back to exponential backoff
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler():
+    """The process-wide scheduler shared by every scraper, HTTP client and browser."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HostScheduler()
+        return _default
+
+
+def _browser_status(driver):
+    try:
+        title = (driver.title or "").lower()
+    except Exception:
+        return None
+    return 429 if any(t in title for t in _THROTTLED_TITLES) else None
+
+
+def polite_get(driver, url, scheduler=None):
+    """driver.get(url) within the host's rate and concurrency budget."""
+    with (scheduler or default_scheduler()).slot(url) as done:
+        with timed("navigation"):
+            driver.get(url)
+        done(_browser_status(driver))
+    record_browser_bytes(driver)
+
+
+def polite_open_window(driver, url, scheduler=None):
+    """Open url in a new browser window within the host's budget (the load itself is not awaited)."""
+    with (scheduler or default_scheduler()).slot(url), timed("navigation"):
+        driver.execute_script("window.open(arguments[0]);", url)
@@ -0,0 +1,192 @@
+"""
+Adaptive "page is ready" waits for Selenium, replacing fixed time.sleep() calls.
+
+Each site declares what ready means for its pages -- CSS selectors that must be
+present, a network idle window (no XHR/fetch in flight and no new resources),
+and a DOM quiet period (no mutations) -- and wait() returns as soon as all of
+them hold:
+
+    READY = for_site("mycme", selectors=("h1",), network_idle=0.5, dom_quiet=0.3, max_wait=8)
+    driver.get(url)
+    READY.wait(driver)
+
+After an in-page action (an AJAX "next" click, a scroll that lazy-loads more
+content) the old page can already look ready, so such waits also say what has
+to change: `after=` takes a predicate, e.g. changed_from() taken before the
+action, and `min_wait=` keeps a floor for changes nothing on the page marks:
+
+    page_changed = changed_from(driver, "a.search-result--title")
+    next_button.click()
+    READY.wait(driver, after=page_changed)
+
+A wait lasts until the page is ready or max_wait has passed; callers scrape
+whatever is there once it returns, so an unready page is never given up on
+early. Each site also learns its usual ready time: waits that run past
+roughly twice the slowest recent one are counted in `slow`, and waits that
+reach max_wait in `timeouts`.
+"""
+
+import threading
+import time
+from collections import deque
+
+from instrumentation import timed
+
+# Installed once per document: a MutationObserver and XHR/fetch hooks record when
+# the DOM last changed and when the network last went quiet.
+_PROBE_JS = """
+var s = window.__readiness;
+if (!s) {
+  var t0 = performance.now();
+  s = window.__readiness = {lastMutation: t0, lastNetwork: t0, resources: 0, inflight: 0};
+  var done = function () { s.inflight = Math.max(0, s.inflight - 1); s.lastNetwork = performance.now(); };
+  new MutationObserver(function () { s.lastMutation = performance.now(); })
+    .observe(document.documentElement || document,
+             {childList: true, subtree: true, attributes: true, characterData: true});
+  var send = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function () {
+    s.inflight++;
+    this.addEventListener('loadend', done);
+    return send.apply(this, arguments);
+  };
+  if (window.fetch) {
+    var origFetch = window.fetch;
+    window.fetch = function () {
+      s.inflight++;
+      return origFetch.apply(this, arguments).finally(done);
+    };
+  }
+}
+var now = performance.now();
+var n = performance.getEntriesByType('resource').length;
+if (n !== s.resources) { s.resources = n; s.lastNetwork = now; }
+var missing = 0;
+for (var i = 0; i < arguments[0].length; i++) {
+  if (!document.querySelector(arguments[0][i])) missing++;
+}
+return {complete: document.readyState === 'complete', missing: missing,
+        domQuiet: (now - s.lastMutation) / 1000,
+        netQuiet: s.inflight > 0 ? 0 : (now - s.lastNetwork) / 1000};
+"""
+
+_FIRST_ATTR_JS = """
+var el = document.querySelector(arguments[0]);
+if (!el) return null;
+return arguments[1] ? el.getAttribute(arguments[1]) : el.textContent;
+"""
+
+
+class Readiness:
+    """
+    Ready conditions for one site plus its learned wait bound.
+
+    selectors: CSS selectors that must all match (use "a, b" for either of two)
+    network_idle: seconds without network activity, or 0 to skip the check
+    dom_quiet: seconds without DOM mutations, or 0 to skip the check
+    max_wait: ceiling for a single wait; min_bound: floor for the learned bound
+    """
+
+    def __init__(self, site, selectors=(), network_idle=0.5, dom_quiet=0.3,
+                 max_wait=10.0, min_bound=1.0, poll=0.1, history=50, warmup=5):
+        self.site = site
+        self.selectors = tuple(selectors)
+        self.network_idle = network_idle
+        self.dom_quiet = dom_quiet
+        self.max_wait = max_wait
+        self.min_bound = min_bound
+        self.poll = poll
+        self.warmup = warmup
+        self._samples = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self.slow = 0
+        self.timeouts = 0
+
+    @property
+    def bound(self):
+        """Learned time after which a wait counts as slow, in seconds."""
+        with self._lock:
+            if len(self._samples) < self.warmup:
+                return self.max_wait
+            ordered = sorted(self._samples)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return min(self.max_wait, max(self.min_bound, 2 * p95 + self.poll))
+
+    def _ready(self, state):
+        return (
+            state.get("complete")
+            and not state.get("missing")
+            and (not self.dom_quiet or state.get("domQuiet", 0) >= self.dom_quiet)
+            and (not self.network_idle or state.get("netQuiet", 0) >= self.network_idle)
+        )
+
+    def wait(self, driver, selectors=None, after=None, min_wait=0.0):
+        """
+        Block until the page is ready or max_wait runs out; returns True if it
+        became ready. `selectors` overrides the site's selectors for
+        this call (pass () to wait for network/DOM quiet only). `after(driver)`
+        must also be true (the page changed since the action that preceded the
+        wait), and the page is not taken as ready before `min_wait` seconds.
+        """
+        with timed("wait"):
+            return self._wait(driver, list(self.selectors if selectors is None else selectors), after, min_wait)
+
+    def _wait(self, driver, selectors, after, min_wait):
+        bound = self.bound
+        limit = max(self.max_wait, min_wait + self.poll)
+        start = time.monotonic()
+        while True:
+            try:
+                state = driver.execute_script(_PROBE_JS, selectors) or {}
+            except Exception:
+                state = {}  # navigation in progress, the document is being replaced
+            elapsed = time.monotonic() - start
+            if elapsed >= min_wait and self._ready(state) and (after is None or _holds(after, driver)):
+                self._learn(elapsed, slow=elapsed > bound)
+                return True
+            if elapsed >= limit:
+                with self._lock:
+                    self.timeouts += 1
+                self._learn(elapsed, slow=True)
+                return False
+            time.sleep(self.poll)
+
+    def _learn(self, elapsed, slow=False):
+        # the real time the page took, so one slow page moves the bound at once
+        with self._lock:
+            self._samples.append(elapsed)
+            self.slow += slow
+
+
+def _holds(predicate, driver):
+    try:
+        return bool(predicate(driver))
+    except Exception:
+        return False  # e.g. the element it looks at is being replaced
+
+
+def changed_from(driver, selector, attribute="href"):
+    """
+    Predicate for wait(after=...): true once the first element matching
+    `selector` has a different `attribute` (attribute=None: text) than it has
+    now. Take it before the action, e.g. the first result link before
+    clicking "next".
+    """
+    before = driver.execute_script(_FIRST_ATTR_JS, selector, attribute)
+
+    def changed(d):
+        current = d.execute_script(_FIRST_ATTR_JS, selector, attribute)
+        return current is not None and current != before
+    return changed
+
+
+_sites = {}
+_sites_lock = threading.Lock()
+
+
+def for_site(site, **conditions):
+    """The shared Readiness of a site (created on first use), so every worker learns one bound."""
+    with _sites_lock:
+        ready = _sites.get(site)
+        if ready is None:
+            ready = _sites[site] = Readiness(site, **conditions)
+        return ready
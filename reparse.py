@@ -0,0 +1,206 @@
+"""
+Offline re-parse of archived pages.
+
+Runs a site's parser over every page stored in the HTML archive (see
+html_archive.py) without touching the network or a browser, so parser fixes
+can be applied to a whole crawl in minutes. Parsing is CPU-bound, so pages are
+spread over a process pool; rows come back in archive order and are written
+with the same columns as a live run:
+
+    python reparse.py --site vindico
+    python reparse.py --site academiccme --workers 8 --out academiccme_reparsed.xlsx
+
+Sites whose rows are not a function of one archived page have no adapter:
+medscape and medpagetoday read their fields through WebDriver (innerText of
+live elements), and primed joins each course page with its faculty profiles,
+which are archived alongside the courses but cached separately.
+"""
+
+import argparse
+import importlib.util
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from html_archive import DEFAULT_ARCHIVE_DIR, HtmlArchive
+from row_sink import atomic_to_excel
+
+CHUNK_PAGES = 256
+OUTPUT_DIR = "reparsed"
+
+
+# ---------- per-site adapters (top-level so worker processes can pickle them) ----------
+def parse_vindico(url, html):
+    from Vinodicocme import parse_event_html
+    return parse_event_html(url, html)
+
+
+def parse_academiccme(url, html):
+    from academiacme import build_row, parse_detail_html
+    return build_row(0, url, {}, parse_detail_html(url, html))
+
+
+def parse_mycme(url, html):
+    from mycme import parse_course_html
+    return parse_course_html(url, html)
+
+
+def parse_cmepassport(url, html):
+    from cmepassport import extract_activity_next_data
+    return extract_activity_next_data(html, url)
+
+
+def parse_abms(url, html):
+    from abms import base_url, parse_activity_html
+    # the live run takes the title from the search results; offline it comes from the page heading
+    heading = BeautifulSoup(html, "lxml").find("h1")
+    row = {"Source URL": base_url, "Activity URL": url,
+           "Title": heading.get_text(" ", strip=True) if heading else ""}
+    row.update(parse_activity_html(html, url))
+    return row
+
+
+def parse_accme(url, html):
+    from ACCME import parse_cards_html
+    # directory pages are archived as <page url>#page=N
+    return parse_cards_html(html, url.split("#", 1)[0])
+
+
+_ama = None
+
+
+def _ama_module():
+    # "Ama edhub.py" is not importable by name
+    global _ama
+    if _ama is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Ama edhub.py")
+        spec = importlib.util.spec_from_file_location("ama_edhub", path)
+        _ama = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_ama)
+    return _ama
+
+
+def parse_ama_edhub(url, html):
+    ama = _ama_module()
+    values = ama.parse_article_details(BeautifulSoup(html, "html.parser"), url)
+    return dict(zip(ama.CSV_HEADERS, values))
+
+
+def _columns(module, name):
+    def load():
+        if module == "ama_edhub":
+            return list(_ama_module().CSV_HEADERS)
+        return list(getattr(__import__(module), name))
+    return load
+
+
+SITES = {
+    "vindico": (parse_vindico, _columns("Vinodicocme", "COLUMNS")),
+    "academiccme": (parse_academiccme, None),
+    "mycme": (parse_mycme, _columns("mycme", "COLUMNS")),
+    "cmepassport": (parse_cmepassport, _columns("cmepassport", "COLUMNS")),
+    "ama_edhub": (parse_ama_edhub, _columns("ama_edhub", "CSV_HEADERS")),
+    "accme": (parse_accme, None),
+    "abms": (parse_abms, None),
+}
+
+
+# ---------- worker ----------
+def _parse_chunk(site, pages):
+    parse = SITES[site][0]
+    rows, errors = [], []
+    for url, html in pages:
+        try:
+            result = parse(url, html)
+        except Exception as e:
+            errors.append((url, f"{type(e).__name__}: {e}"))
+            continue
+        if result is None:
+            continue
+        if isinstance(result, dict):
+            result = [result]
+        rows.extend(result)
+    return rows, errors
+
+
+def _chunks(pages, size):
+    chunk = []
+    for page in pages:
+        chunk.append(page)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_reparse(site, archive_dir=DEFAULT_ARCHIVE_DIR, workers=None, chunk_pages=CHUNK_PAGES):
+    """
+    Yield (rows, errors) per chunk of archived pages of `site`, in archive order.
+    At most two chunks per worker are read from the archive ahead of the
+    parsers, so memory stays flat however large the archive is.
+    """
+    workers = workers or os.cpu_count() or 1
+    archive = HtmlArchive(archive_dir)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for chunk in _chunks(archive.iter_pages(site=site), chunk_pages):
+                pending.append(pool.submit(_parse_chunk, site, chunk))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    finally:
+        archive.close()
+
+
+def reparse(site, archive_dir=DEFAULT_ARCHIVE_DIR, workers=None, chunk_pages=CHUNK_PAGES):
+    """Parse every archived page of `site`; returns (rows, errors) in archive order."""
+    rows, errors = [], []
+    for chunk_rows, chunk_errors in iter_reparse(site, archive_dir, workers, chunk_pages):
+        rows.extend(chunk_rows)
+        errors.extend(chunk_errors)
+    return rows, errors
+
+
+def to_frame(site, rows):
+    columns_loader = SITES[site][1]
+    if columns_loader is not None:
+        return pd.DataFrame(rows, columns=columns_loader())
+    # academiccme, accme and abms have open-ended columns ("additional info", provider details), as in the live run
+    df = pd.DataFrame(rows)
+    if "sno" in df.columns:
+        df["sno"] = range(1, len(df) + 1)
+        df = df[["sno", "url"] + [c for c in df.columns if c not in ("sno", "url")]]
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-parse archived HTML without re-crawling.")
+    parser.add_argument("--site", required=True, choices=sorted(SITES))
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_DIR, help="archive directory")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--out", default=None, help=f"output .xlsx (default: {OUTPUT_DIR}/<site>.xlsx)")
+    args = parser.parse_args()
+
+    out = args.out or os.path.join(OUTPUT_DIR, f"{args.site}.xlsx")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+
+    start = time.time()
+    rows, errors = reparse(args.site, args.archive, args.workers)
+    for url, err in errors[:20]:
+        print(f"❌ {url}: {err}")
+    if len(errors) > 20:
+        print(f"... and {len(errors) - 20} more parse errors")
+
+    atomic_to_excel(to_frame(args.site, rows), out)
+    print(f"✅ {len(rows)} rows from {args.site} ({len(errors)} errors) in {time.time() - start:.1f}s -> {out}")
+
+
+if __name__ == "__main__":
+    main()
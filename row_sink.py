@@ -0,0 +1,136 @@
+"""
+Append-only row sink / checkpointing writer for long scraping runs.
+
+Scraped rows are appended to a JSON Lines file (constant cost per row) instead of
+rebuilding and rewriting the whole workbook after every row. Rows can be buffered
+and flushed in batches, by row count or by elapsed time. The Excel file is
+produced once from the JSONL file, at the end of the run or on request, and is
+swapped into place atomically so a crash never leaves a half-written workbook:
+
+    python row_sink.py cme_passport_providers.jsonl cme_passport_providers.xlsx
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+
+class RowSink:
+    """
+    Appends one JSON object per line.
+
+    Rows are buffered and written out once flush_rows rows are pending or
+    flush_seconds have passed since the last flush (the defaults write every row
+    immediately). close() flushes whatever is left.
+    """
+
+    def __init__(self, path, resume=False, flush_rows=1, flush_seconds=None):
+        self.path = path
+        self.count = 0
+        self.flush_rows = max(1, flush_rows)
+        self.flush_seconds = flush_seconds
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._fh = open(path, "a" if resume else "w", encoding="utf-8")
+        # a crash can leave a half-written last line; start appending on a fresh one
+        if resume and self._fh.tell() > 0 and not _ends_with_newline(path):
+            self._fh.write("\n")
+
+    def write(self, row):
+        self._buffer.append(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        self.count += 1
+        if len(self._buffer) >= self.flush_rows:
+            self.flush()
+        elif self.flush_seconds is not None and time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._fh.write("".join(self._buffer))
+            self._buffer = []
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if not self._fh.closed:
+            self.flush()
+            self._fh.close()
+
+    def export_excel(self, xlsx_path, columns=None, key=None):
+        if not self._fh.closed:
+            self.flush()
+        return export_excel(self.path, xlsx_path, columns=columns, key=key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def read_rows(path):
+    """Load every complete row from a JSONL file (a truncated trailing line is skipped)."""
+    rows = []
+    if not os.path.exists(path):
+        return rows
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue
+    return rows
+
+
+def export_excel(jsonl_path, xlsx_path, columns=None, key=None):
+    """
+    Write the rows collected in jsonl_path to an Excel workbook; returns the row count.
+    With key (a column name), only the last row written for each key is kept, so
+    refreshed rows appended to the file replace the older ones.
+    """
+    df = pd.DataFrame(read_rows(jsonl_path), columns=columns)
+    if key is not None and len(df):
+        df = df.drop_duplicates(subset=key, keep="last")
+    atomic_to_excel(df, xlsx_path)
+    return len(df)
+
+
+def atomic_to_excel(df, xlsx_path):
+    """Write df to a temp file next to xlsx_path, then rename it over the target."""
+    folder = os.path.dirname(os.path.abspath(xlsx_path))
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", prefix=".tmp-", dir=folder)
+    os.close(fd)
+    try:
+        df.to_excel(tmp_path, index=False)
+        os.replace(tmp_path, xlsx_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python row_sink.py <rows.jsonl> <output.xlsx>")
+        sys.exit(1)
+    n = export_excel(sys.argv[1], sys.argv[2])
+    print(f"Exported {n} rows to {sys.argv[2]}")
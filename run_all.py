@@ -0,0 +1,164 @@
+"""
+Run several scrapers at once in one process.
+
+Every site's main() runs on its own thread; they share the process-wide
+browser budget (browser_pool.set_browser_limit), the per-host scheduler
+(rate_limit.default_scheduler) and the HTML archive, and write their
+workbooks to the common wave directories. A full refresh takes about as long
+as the slowest site instead of the sum of all of them:
+
+    python run_all.py                      # every non-interactive site
+    python run_all.py accme abms --browsers 2
+
+By default the browser budget is the peak number of Chrome sessions the
+selected sites hold together, so no site waits for another one's browser. A
+smaller --browsers saves memory: a site then waits until a browser is free
+before it starts its first one, and a site with a pool of sessions (Vindico)
+runs with as many as the budget leaves it.
+    python run_all.py --list
+"""
+
+import argparse
+import importlib
+import importlib.util
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from browser_pool import set_browser_limit
+
+WAVE_0 = "WAVE 0-PROVIDERS"
+WAVE_1 = "WAVE 1-Activities"
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class Site:
+    """
+    module: importable module name, or a .py file name for scripts that are not importable by name
+    outputs: {module constant: file name} -- each constant is pointed at the site's wave directory
+    run: run(module, out) for sites whose main() takes arguments; out(name) is the path in the wave directory
+    interactive: the site stops for console input, so it only runs when named explicitly
+    browsers: Chrome sessions the site holds at its peak
+    """
+
+    def __init__(self, name, module, wave, outputs=None, run=None, interactive=False, browsers=1):
+        self.name = name
+        self.module = module
+        self.wave = wave
+        self.outputs = outputs or {}
+        self.run = run
+        self.interactive = interactive
+        self.browsers = browsers
+
+
+SITES = [
+    Site("accme", "ACCME", WAVE_0, {"OUTPUT_FILE": "accme_providers.xlsx"}),
+    Site("abms", "abms", WAVE_0, {"OUTPUT_FILE": "ABMS_Providers.xlsx"}),
+    Site("cmepassport", "cmepassport", WAVE_0, {"OUTPUT_FILE": "cme_passport_providers.xlsx",
+                                                "DELTA_OUTPUT_FILE": "cme_passport_delta.xlsx"}),
+    Site("medscape", "medscape", WAVE_1, {"OUTPUT_FILE": "medscape_neurology_activities.xlsx"}),
+    Site("medpagetoday", "medpagetoday", WAVE_1, {"OUTPUT_CSV": "Medpagetoday_activities.csv",
+                                                  "OUTPUT_XLSX": "Medpagetoday_activities.xlsx"}),
+    Site("primed", "primed", WAVE_1,
+         run=lambda mod, out: mod.main(save_csv=out("Primed_courses_faculty.csv"),
+                                       save_xlsx=out("Primed_courses_faculty.xlsx"), headless=True)),
+    Site("academiccme", "academiacme", WAVE_1, {"OUTPUT_XLSX": "academiccme_output.xlsx",
+                                                "EARLY_SNAPSHOT": "academiccme_first5.xlsx"}),
+    Site("mycme", "mycme", WAVE_1, {"OUTPUT_FILE": "mycme_data.csv"}),
+    Site("vindico", "Vinodicocme", WAVE_1, {"OUTPUT_FILE": "vindico_live_events.xlsx"},
+         browsers=2),  # Vinodicocme.BROWSER_SESSIONS
+    Site("ama_edhub", "Ama edhub.py", WAVE_1, {"CSV_FILE": "ama_articles.csv"}, interactive=True,
+         browsers=3),  # WORKERS in "Ama edhub.py"
+]
+SITES_BY_NAME = {s.name: s for s in SITES}
+
+
+def load_module(name):
+    """Import a scraper by module name, or from a file in this directory ("Ama edhub.py")."""
+    if not name.endswith(".py"):
+        return importlib.import_module(name)
+    key = os.path.splitext(name)[0].replace(" ", "_").lower()
+    spec = importlib.util.spec_from_file_location(key, os.path.join(ROOT, name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_site(site, module, out_root):
+    wave_dir = os.path.join(out_root, site.wave)
+    os.makedirs(wave_dir, exist_ok=True)
+
+    def out(filename):
+        return os.path.join(wave_dir, filename)
+
+    for constant, filename in site.outputs.items():
+        setattr(module, constant, out(filename))
+
+    print(f"▶ {site.name} started")
+    if site.run is not None:
+        site.run(module, out)
+    else:
+        module.main()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several scrapers concurrently.")
+    parser.add_argument("sites", nargs="*", help="sites to run (default: every non-interactive site)")
+    parser.add_argument("--list", action="store_true", help="list the registered sites and exit")
+    parser.add_argument("--parallel", type=int, default=None, help="sites running at once (default: all)")
+    parser.add_argument("--browsers", type=int, default=None,
+                        help="Chrome sessions allowed at once, 0 for no limit (default: what the selected sites need)")
+    parser.add_argument("--out-root", default=ROOT, help="directory holding the wave folders")
+    args = parser.parse_args()
+
+    if args.list:
+        for s in SITES:
+            note = " (interactive)" if s.interactive else ""
+            print(f"{s.name:<14} {s.wave}{note}")
+        return
+
+    unknown = [n for n in args.sites if n not in SITES_BY_NAME]
+    if unknown:
+        parser.error(f"unknown site(s): {', '.join(unknown)}; use --list")
+    selected = [SITES_BY_NAME[n] for n in args.sites] or [s for s in SITES if not s.interactive]
+
+    wanted = sum(s.browsers for s in selected)
+    budget = wanted if args.browsers is None else args.browsers
+    set_browser_limit(budget or None)
+    if budget and budget < wanted:
+        print(f"⚠ {len(selected)} sites need up to {wanted} browsers, the budget is {budget}:"
+              f" sites will wait for a free browser and pools run short, so the run takes longer than the slowest site")
+
+    # imported up front, one at a time, so a broken scraper fails before any crawling starts
+    modules = {s.name: load_module(s.module) for s in selected}
+
+    results = {}
+    lock = threading.Lock()
+    started = time.time()
+
+    def task(site):
+        t0 = time.time()
+        try:
+            run_site(site, modules[site.name], args.out_root)
+            status = "ok"
+        except BaseException as e:  # one failing site must not stop the others
+            traceback.print_exc()
+            status = f"failed: {type(e).__name__}: {e}"
+        with lock:
+            results[site.name] = (status, time.time() - t0)
+        print(f"■ {site.name} {status} in {time.time() - t0:.0f}s")
+
+    with ThreadPoolExecutor(max_workers=args.parallel or len(selected), thread_name_prefix="site") as pool:
+        for future in as_completed([pool.submit(task, s) for s in selected]):
+            future.result()
+
+    print(f"\nAll done in {time.time() - started:.0f}s")
+    for s in selected:
+        status, elapsed = results.get(s.name, ("not run", 0))
+        print(f"  {s.name:<14} {elapsed:>7.0f}s  {status}")
+
+
+if __name__ == "__main__":
+    main()
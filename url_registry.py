@@ -0,0 +1,80 @@
+"""
+Ordered registry of discovered URLs, deduplicated on a canonical form.
+
+Listing crawlers see the same detail page under several spellings: with and
+without a trailing slash, with tracking parameters (utm_*, resultClick, ...),
+with a #fragment. canonicalize_url() folds those together, and UrlRegistry
+keeps the first URL seen for each canonical key, in discovery order, with
+O(1) membership checks:
+
+    found = UrlRegistry()
+    for href in hrefs:
+        if found.add(href):
+            ...            # first time this page was seen
+    links = found.urls()   # original URLs, in discovery order
+"""
+
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track how a page was reached
+TRACKING_PARAMS = {"resultclick", "bypasssolrid", "fbclid", "gclid", "mc_cid", "mc_eid", "_ga"}
+TRACKING_PREFIXES = ("utm_",)
+
+
+def _is_tracking(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url):
+    """
+    Dedup key for a URL: lower-cased scheme and host, no default port, no
+    fragment, no tracking parameters, remaining parameters sorted, and no
+    trailing slash on the path.
+    """
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not _is_tracking(k)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class UrlRegistry:
+    def __init__(self, urls=(), key=canonicalize_url):
+        self.key = key
+        self._urls = {}  # canonical key -> first URL seen (dicts keep insertion order)
+        self.add_many(urls)
+
+    def add(self, url):
+        """Register url; returns True if its canonical form was not seen before."""
+        k = self.key(url)
+        if not k or k in self._urls:
+            return False
+        self._urls[k] = url
+        return True
+
+    def add_many(self, urls):
+        """Register several URLs; returns how many were new."""
+        return sum(1 for u in urls if self.add(u))
+
+    def get(self, url):
+        """The URL first registered under url's canonical form, or None."""
+        return self._urls.get(self.key(url))
+
+    def urls(self):
+        return list(self._urls.values())
+
+    def __contains__(self, url):
+        return self.key(url) in self._urls
+
+    def __len__(self):
+        return len(self._urls)
+
+    def __iter__(self):
+        return iter(list(self._urls.values()))